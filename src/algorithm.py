@@ -1,18 +1,87 @@
 import time
 import math
-import random
+import heapq
 import numpy as np
 import collections
 import itertools
+import concurrent.futures
 
 from solution import Solution
 from route import Route
+from savings import SavingsList
+from cache import SimulationCache
+from crn import CommonRandomNumbers
+from profiler import Profiler
 
 import global_methods
 
 
 BETA_DETERMINISTIC = 0.9999999
 
+# The bounds of a construction are checked every ABORT_CHECK_INTERVAL edges popped
+# from the savings list, if at most ABORT_CHECK_MERGES merges are still needed,
+# and the merges are tried if there are at most ABORT_PROBE_EDGES live edges
+# (see Simheuristic._hopeless).
+ABORT_CHECK_INTERVAL = 128
+ABORT_CHECK_MERGES = 4
+ABORT_PROBE_EDGES = 64
+
+# The starting gamma is never higher than the first multiple of GAMMA_STEP which gives
+# a feasible deterministic construction (see Simheuristic.starting_solution).
+GAMMA_STEP = 10.0
+
+
+
+class GammaTrace (object):
+    """
+    An instance of this class records, during the construction of a solution, the
+    delay of the last merge checked against gamma (see Simheuristic.prepare_merging).
+
+    :attr delay: The delay of the last merge checked against gamma.
+
+    """
+    __slots__ = ("delay",)
+
+    def __init__ (self):
+        self.delay = None
+
+
+
+# The decisions taken by a deterministic construction (see Simheuristic.deterministic_solution),
+# i.e., the tuples (step, delay, direct) of the merges checked against gamma, where <direct> tells
+# the direction the routes have been merged in (None if the merge was rejected), and the number of
+# steps made (i.e., of edges of the savings list considered).
+Construction = collections.namedtuple("Construction", ("decisions", "stop"))
+
+
+
+# The algorithm and starting solution used by a worker process (see Simheuristic.parallel_search)
+_worker = None
+
+
+def _init_worker (algorithm, starting_sol):
+    global _worker
+    _worker = (algorithm, starting_sol)
+
+
+
+def _run_worker (maxiter, rng):
+    """
+    This method is executed by a worker process. It runs <maxiter> iterations of the
+    search with an independent stream of random numbers, and returns the elite solutions
+    and the best deterministic solution as sequences of node IDs, the number of iterations
+    made, and the Profiler of the worker (if the algorithm is profiled).
+
+    """
+    algorithm, starting_sol = _worker
+    algorithm.rng = rng
+    algorithm.elites = collections.deque([], maxlen=algorithm.n_elites)
+    algorithm.profiler = Profiler() if algorithm.profile else None
+    algorithm.iterations = 0
+    dbest, _ = algorithm._search(maxiter, starting_sol, starting_sol)
+    elites = [(tuple(r.sequence for r in sol.routes), sol.stochastic_cost) for sol in algorithm.elites]
+    return elites, tuple(r.sequence for r in dbest.routes), algorithm.iterations, algorithm.profiler
+
 
 
 class Simheuristic (object):
@@ -24,7 +93,17 @@ class Simheuristic (object):
                   max_travel_time, 
                   beta = (.1, .3), 
                   maxiter = 3000, 
-                  n_elites = 5):
+                  n_elites = 5,
+                  vectorized = True,
+                  n_workers = 1,
+                  seed = None,
+                  time_limit = None,
+                  max_no_improvement = None,
+                  target_error = None,
+                  cache_size = None,
+                  common_random_numbers = False,
+                  rng = None,
+                  profile = False):
         """
         Constructor.
 
@@ -35,10 +114,34 @@ class Simheuristic (object):
         :param beta: The min and max values for the parameter of the quasi-geometric distribution.
         :param maxiter: The number of iterations of the metaheuristic framework.
         :param n_elites: The elite solutions kept in memory.
+        :param vectorized: If True the stochastic simulations are made using
+                            array operations instead of iterating the replications.
+        :param n_workers: The number of worker processes the iterations are distributed to.
+        :param seed: The seed of the random numbers generator (a reproducible and 
+                    independent stream is derived from it for each worker).
+        :param time_limit: The maximum time (in seconds) the algorithm can run. When it is reached
+                        the search stops, and the final simulation of the elites is shortened to
+                        fit in the remaining time. NOTE: The starting solution is always built.
+        :param max_no_improvement: The maximum number of consecutive iterations without improving
+                        the best deterministic solution, after which the search stops.
+        :param target_error: If given, the simulations are sequential: replications are made in
+                        batches until the standard error of the stochastic cost is below this value
+                        (50 and 10,000 replications become the maximum), and the screening of a new
+                        solution stops as soon as it is clearly worse than the best one.
+        :param cache_size: If given, the results of the simulations of the routes are kept in a
+                        cache of this size, and reused (and extended) when a route is met again.
+        :param common_random_numbers: If True all the solutions are simulated with the same
+                        random numbers (derived from the seed), so that their stochastic costs are
+                        compared with much less noise. The vectorized simulation is always used.
+        :param rng: The numpy Generator all the random numbers are drawn from. If not given,
+                        a new one is created from the seed.
+        :param profile: If True each run records the time spent in its phases and some
+                        counters in the attribute <profiler> (see Profiler and _profiled).
 
         """
         self.nodes = nodes
         self.edges = edges
+        self.savings_list = SavingsList(edges)
 
         self.n_vehicles = n_vehicles
         self.max_travel_time = max_travel_time
@@ -46,16 +149,92 @@ class Simheuristic (object):
         self.beta = beta
         self.maxiter = maxiter
         self.n_elites = n_elites
+        self.vectorized = vectorized
+        self.n_workers = n_workers
+        self.seed = seed
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        self.time_limit = time_limit
+        self.max_no_improvement = max_no_improvement
+        self.target_error = target_error
+        self.cache = SimulationCache(cache_size) if cache_size else None
+        self.crn = None
+        if common_random_numbers:
+            self.crn = CommonRandomNumbers(seed if seed is not None else int(self.rng.integers(2**63)))
+        self.profile = profile
+        self.profiler = None
+        self._deadline = None
+        self._edges_by_nodes = None
 
         self.elites = collections.deque([], maxlen=n_elites)
+        self.aborted = 0
+        self.iterations = 0
+        self.search_time = 0.0
         self.ctime = 0.0
         self.sbest = None
         self.dbest = None
 
 
 
+    def _start (self):
+        """
+        This method prepares a new run of the algorithm, setting its deadline and,
+        if the algorithm is profiled, a new Profiler.
+
+        The iterations actually made by the run (which may be fewer than <maxiter> if
+        the search is stopped) are counted in the attribute <iterations>, and the time
+        spent in them in the attribute <search_time>.
+
+        """
+        self._deadline = time.time() + self.time_limit if self.time_limit is not None else None
+        self.iterations, self.search_time = 0, 0.0
+        self.profiler = Profiler() if self.profile else None
+
+
+
+    def _profiled (self, phase, function):
+        """
+        This method returns <function> itself if the algorithm is not profiled, so that
+        no overhead is added, otherwise a function doing the same whose calls are
+        recorded as the phase <phase> (see Profiler.wrap).
+
+        """
+        return function if self.profiler is None else self.profiler.wrap(phase, function)
+
+
+
+    def _simulate (self, sol, maxiter, **kwargs):
+        """
+        This method simulates a solution with the settings of the algorithm (see
+        Solution.simulate). If the algorithm is profiled, the simulation is recorded
+        together with the replications made and the requests to the cache.
+
+        :param sol: The solution.
+        :param maxiter: The number of replications (the maximum in sequential mode).
+        :param kwargs: The other parameters of Solution.simulate.
+        :return: The stochastic cost.
+
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return sol.simulate(maxiter, self.max_travel_time, self.vectorized, crn=self.crn, rng=self.rng, **kwargs)
+
+        cache = self.cache
+        sampled = sum(r.sampled for r in sol.routes)
+        hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        start = time.perf_counter()
+        cost = sol.simulate(maxiter, self.max_travel_time, self.vectorized, crn=self.crn, rng=self.rng, **kwargs)
+        profiler.add("simulation", time.perf_counter() - start)
+
+        profiler.count("replications", sum(r.sampled for r in sol.routes) - sampled)
+        if cache is not None:
+            profiler.count("cache_hits", cache.hits - hits)
+            profiler.count("cache_misses", cache.misses - misses)
+        return cost
+
+
+
     @staticmethod
-    def prepare_merging(medge, route1, route2, gamma, max_travel_time):
+    def prepare_merging(medge, route1, route2, gamma, max_travel_time, trace=None):
         """
         This method checks if the merging of two routes is possible. Four main controls
         are made:
@@ -70,6 +249,7 @@ class Simheuristic (object):
         :param route2: The second route.
         :param gamma: The maximum cumulated delay allowed to the routes.
         :param max_travel_time: The maximum travel time of the routes.
+        :param trace: The GammaTrace where the delay of the merge is recorded (if any).
 
         :return:| (i)   The feasibility of the mearging, 
                 | (ii)  The mearging edge (eventually reversed)
@@ -94,42 +274,47 @@ class Simheuristic (object):
         
         # Condition 3: the maximum delay cumulated by the new route cannot exceed a certain threshold (i.e., gamma).
         # For doing this control, both directions of the new route must be observed.
-        iedges = tuple(route1.edges)
-        iedges_inv = tuple(reversed([edge.inverse for edge in route1.edges]))
-        jedges = tuple(route2.edges)
-        jedges_inv = tuple(reversed([edge.inverse for edge in route2.edges]))
-
-        if medge.origin == route1.edges[0].end:
-            iedges, iedges_inv = iedges_inv, iedges
-            
-        if medge.end == route2.edges[-1].origin:
-            jedges, jedges_inv = jedges_inv, jedges
-
-        _, delay = global_methods.evaluate(itertools.chain(iedges[:-1], (medge,), jedges[1:]))
-        _, delay_inv = global_methods.evaluate(itertools.chain(jedges_inv[:-1], (medge.inverse,), iedges_inv[1:]))
+        # The delays are computed from the delay profiles of the routes: in the new route, the customers of
+        # the first route keep their delay cost, while the customers of the second route are visited later.
+        ireversed = iNode == route1.first
+        jreversed = jNode == route2.last
+        iprofile, iprofile_inv = route1.profile(ireversed), route1.profile(not ireversed)
+        jprofile, jprofile_inv = route2.profile(jreversed), route2.profile(not jreversed)
+
+        depot = route1.depot
+        depot_delay = max(route1.travel_time + route2.travel_time - medge.saving - depot.close, 0)
+        depot_cost = global_methods.predict(depot_delay, depot.importance)
+
+        tt = medge.deterministic_travel_time
+        delay = iprofile.cost + global_methods.shifted_cost(jprofile, iprofile.arrival + tt - jprofile.start) + depot_cost
+        delay_inv = jprofile_inv.cost + global_methods.shifted_cost(iprofile_inv, jprofile_inv.arrival + tt - iprofile_inv.start) + depot_cost
         
+        if trace is not None:
+            trace.delay = min(delay, delay_inv)
+
         if delay > gamma and delay_inv > gamma:
             return False, medge, route1, route2    # None of directions is feasible
         
         if delay <= delay_inv:
-            if medge.origin == route1.edges[0].end:
+            if ireversed:
                 route1.reverse()
-            if medge.end == route2.edges[-1].origin:
+            if jreversed:
                 route2.reverse()
             return True, medge, route1, route2
         else:
-            if medge.inverse.origin == route2.edges[0].end:
+            if jNode == route2.first:
                 route2.reverse()
-            if medge.inverse.end == route1.edges[-1].origin:
+            if iNode == route1.last:
                 route1.reverse()
             return True, medge.inverse, route2, route1
 
 
 
     @staticmethod
-    def biased_random_selection (beta, list_size):
+    def biased_random_selection (beta, size, rng):
         """
-        This method allows a biased randomised selection over a list.
+        This method allows a biased randomised selection over a list, drawing
+        the positions of <size> consecutive selections at once.
 
         To each element of the list is assigned a certain probability to be
         selected, that depends on its position in list. The firt elements of
@@ -146,15 +331,92 @@ class Simheuristic (object):
         to zero, the distribution approximates a uniform where all the elements
         have the same probability to be selected.
 
+        The positions are drawn from the geometric distribution, as if the list
+        were infinite: the position in a list of n elements is the position
+        drawn modulo n, which is computed when the selection is made, since
+        the list gets shorter after each selection.
+
         :param beta: The parameter of the quasi-geometric distribution.
-        :param list_size: The size of the list.
+        :param size: The number of selections.
+        :param rng: The numpy Generator.
+
+        :return: The list of the positions of the selected elements.
+
+        """
+        return (rng.geometric(beta, size) - 1).tolist()
+
 
-        :return: The position in list of the selected element.
 
+
+
+    def _hopeless (self, routes, gamma, max_travel_time, max_total_time):
         """
-        return int(math.log(random.random(), 1 - beta)) % list_size
+        This method checks if a construction can no longer reduce the routes to
+        the number of vehicles.
+
+        The next merges can only use the edges still in the savings list which
+        connect the ends of two different routes (i.e., the live edges). Then, the
+        construction is hopeless if:
+
+            - The routes connected by live edges form more connected components
+              than the vehicles, since a merge joins two connected routes.
+
+            - The total travel time of the routes, reduced by the m highest savings
+              of the live edges, is still higher than the <max_total_time> allowed
+              to the final routes, since exactly m = len(routes) - n_vehicles merges
+              are still needed, and each of them reduces the total travel time by
+              the saving of its edge.
 
+            - There are at most ABORT_PROBE_EDGES live edges, and none of them can
+              merge its routes now, since the routes cannot change anymore.
 
+        :param routes: The current routes.
+        :param gamma: The maximum cumulated delay allowed to the routes.
+        :param max_travel_time: The maximum travel time of the routes.
+        :param max_total_time: The maximum total travel time of the final routes.
+        :return: True if the construction is hopeless.
+
+        """
+        get = self.savings_list.get
+        ends = [(r.first,) if r.first is r.last else (r.first, r.last) for r in routes]
+        component = list(range(len(routes)))
+        components = len(routes)
+        live = []
+
+        for a in range(len(routes)):
+            for b in range(a + 1, len(routes)):
+                for iNode in ends[a]:
+                    for jNode in ends[b]:
+                        edge = get(iNode, jNode)
+                        if edge is None:
+                            continue
+                        live.append(edge)
+                        # Join the components of the two routes
+                        ca, cb = component[a], component[b]
+                        if ca != cb:
+                            component = [ca if c == cb else c for c in component]
+                            components -= 1
+
+        if components > self.n_vehicles:
+            return True
+
+        m = len(routes) - self.n_vehicles
+        if sum(r.travel_time for r in routes) - sum(heapq.nlargest(m, (e.saving for e in live))) > max_total_time:
+            return True
+
+        if len(live) > ABORT_PROBE_EDGES:
+            return False
+
+        # With a gamma of minus infinity, prepare_merging does not change the routes,
+        # and records the delay of the merge if the other conditions are satisfied.
+        probe = GammaTrace()
+        for edge in live:
+            probe.delay = None
+            self.prepare_merging(edge, edge.origin.route, edge.end.route, -math.inf, max_travel_time, probe)
+            if probe.delay is not None and probe.delay <= gamma:
+                return False
+
+        return True
 
 
 
@@ -164,6 +426,10 @@ class Simheuristic (object):
         For beta very close to one, the solution is deterministic, otherwise
         it is built using a biased randomised selection.
 
+        When the merges stall, the construction is abandoned as soon as it can no
+        longer provide a feasible solution (see _hopeless), and counted in the
+        attribute <aborted>.
+
         :param beta: The parameter of the quasi-geometric distribution.
         :return: The new solution and an indicator of feasibility.
 
@@ -176,68 +442,404 @@ class Simheuristic (object):
             n.interior = False
             n.route = r
 
-        prepare_merging = self.prepare_merging
-        biased_random_selection = self.biased_random_selection
-        prepare_merging = self.prepare_merging
+        prepare_merging = self._profiled("prepare_merging", self.prepare_merging)
+        merge = self._profiled("merge", Route.merge)
         n_vehicles = self.n_vehicles
 
-        # Iterative process for routes' merging
-        savings_list = list(self.edges)
+        # Each final route is within the maximum travel time, except the routes of a
+        # single customer which exceed it, since they cannot be merged.
+        max_total_time = n_vehicles * max_travel_time + sum(max(r.travel_time - max_travel_time, 0) for r in routes)
+        max_total_time += 1e-9 * max_total_time
+        check, n_routes, checked = ABORT_CHECK_INTERVAL, len(routes), None
 
-        for _ in range(len(self.edges)):
-            edgeIndex = biased_random_selection(beta, len(savings_list))
-            edge = savings_list.pop(edgeIndex)
+        # With no more customers than vehicles, no merge is needed
+        if len(routes) <= n_vehicles:
+            return True, Solution(tuple(routes))
+
+        # The positions of the selections are drawn all together
+        positions = self.biased_random_selection(beta, len(self.edges), self.rng)
+
+        # Iterative process for routes' merging
+        savings_list = self.savings_list
+        savings_list.reset()
+        remaining = len(savings_list)
+
+        for position in positions:
+            edge = savings_list.pop(position % remaining)
+            remaining -= 1
+
+            # The bounds are checked when no merge has been made since the previous check,
+            # and only once for each number of routes: if the construction is not hopeless,
+            # a merge can still be made.
+            check -= 1
+            if check == 0:
+                if len(routes) == n_routes != checked and n_routes - n_vehicles <= ABORT_CHECK_MERGES:
+                    if self._hopeless(routes, gamma, max_travel_time, max_total_time):
+                        self.aborted += 1
+                        if self.profiler is not None:
+                            self.profiler.count("aborted_constructions")
+                        return False, None
+                    checked = n_routes
+                check, n_routes = ABORT_CHECK_INTERVAL, len(routes)
+
+            # The edges incident to an interior node, or connecting two nodes of the same
+            # route, cannot merge any route, and are skipped without checking them.
+            iNode, jNode = edge.origin, edge.end
+            if iNode.interior or jNode.interior:
+                continue
+            iRoute, jRoute = iNode.route, jNode.route
+            if iRoute is jRoute:
+                continue
 
-            iRoute = edge.origin.route
-            jRoute = edge.end.route
-            
             feasible, merging_edge, froute, sroute = prepare_merging (edge, iRoute, jRoute, gamma, max_travel_time)
             if feasible:
-                froute.merge (sroute, by=merging_edge)
+                merge (froute, sroute, by=merging_edge)
                 routes.remove (sroute)        
             
-            if len(routes) <= n_vehicles:
-                return True, Solution(tuple(routes))
-        else:
-            # if the algorithm has not been able to provide a feasible solution a non feasible solution is returned.
-            return False, None
+                if len(routes) <= n_vehicles:
+                    return True, Solution(tuple(routes))
+
+        # if the algorithm has not been able to provide a feasible solution a non feasible solution is returned.
+        return False, None
 
         
 
-    def __call__ (self):
-        feasible, self.gamma = False, -10.0
-        while not feasible:
-            self.gamma += 10.0
-            feasible, starting_sol = self.getSolution(self.gamma, self.max_travel_time, BETA_DETERMINISTIC)
+    def deterministic_solution (self, gamma, constructions = ()):
+        """
+        This method builds the deterministic solution for a certain gamma, i.e., merging
+        the routes considering the edges in order of saving (as getSolution would do for
+        beta very close to one), and records the decisions taken (see Construction).
 
-        starting_sol.evaluate()
-        starting_sol.simulate(50, self.max_travel_time)        
-        self.elites.append(starting_sol)
-        sbest = starting_sol
-        dbest = starting_sol
+        The construction for another gamma takes the same decisions until a merge accepted
+        with a delay higher than gamma, or rejected with a delay not higher than gamma.
+        Hence, when previous constructions are given, the one sharing more steps with this
+        construction is replayed, i.e., its merges are repeated without checking them, and
+        the construction goes on normally from the first different decision.
+
+        :param gamma: The maximum cumulated delay allowed to the routes.
+        :param constructions: The previous constructions.
+        :return: The feasibility, the solution (or None) and the Construction.
+
+        """
+        edges = self.edges
+        max_travel_time = self.max_travel_time
+        n_vehicles = self.n_vehicles
+        prepare_merging = self._profiled("prepare_merging", self.prepare_merging)
+        merge = self._profiled("merge", Route.merge)
+
+        # Find the previous construction sharing more steps
+        start, replay = 0, ()
+        for construction in constructions:
+            stop = construction.stop
+            for step, delay, direct in construction.decisions:
+                if (direct is None) != (delay > gamma):
+                    stop = step
+                    break
+            if stop > start:
+                start, replay = stop, construction.decisions
 
+        routes = []
+        for n in self.nodes[1:]:
+            r = Route([n.dn_edge,n.nd_edge])
+            r.evaluate()
+            routes.append(r)
+            n.interior = False
+            n.route = r
+
+        # With no more customers than vehicles, no merge is needed
+        if len(routes) <= n_vehicles:
+            return True, Solution(tuple(routes)), Construction([], 0)
+
+        # Replay the merges of the previous construction
+        decisions = []
+        for step, delay, direct in replay:
+            if step >= start:
+                break
+            decisions.append((step, delay, direct))
+            if direct is None:
+                continue
+
+            edge = edges[step]
+            iNode, jNode = edge.origin, edge.end
+            iRoute, jRoute = iNode.route, jNode.route
+            if direct:
+                if iNode == iRoute.first:
+                    iRoute.reverse()
+                if jNode == jRoute.last:
+                    jRoute.reverse()
+                merge(iRoute, jRoute, by=edge)
+                routes.remove(jRoute)
+            else:
+                if jNode == jRoute.first:
+                    jRoute.reverse()
+                if iNode == iRoute.last:
+                    iRoute.reverse()
+                merge(jRoute, iRoute, by=edge.inverse)
+                routes.remove(iRoute)
+
+            if len(routes) <= n_vehicles:
+                return True, Solution(tuple(routes)), Construction(decisions, step + 1)
+
+        # Go on with the construction
+        trace = GammaTrace()
+        for step in range(start, len(edges)):
+            edge = edges[step]
+            iNode, jNode = edge.origin, edge.end
+            if iNode.interior or jNode.interior or iNode.route is jNode.route:
+                continue
+            trace.delay = None
+            feasible, merging_edge, froute, sroute = prepare_merging(edge, iNode.route, jNode.route, gamma, max_travel_time, trace)
+            if trace.delay is not None:
+                decisions.append((step, trace.delay, merging_edge is edge if feasible else None))
+            if feasible:
+                merge(froute, sroute, by=merging_edge)
+                routes.remove(sroute)
+
+            if len(routes) <= n_vehicles:
+                return True, Solution(tuple(routes)), Construction(decisions, step + 1)
+
+        return False, None, Construction(decisions, len(edges))
+
+
+
+    def starting_solution (self):
+        """
+        This method looks for a low gamma for which the deterministic construction provides
+        a feasible solution, and sets it as the gamma of the algorithm. The gamma found is
+        never higher than the first feasible multiple of GAMMA_STEP, and it is found with no
+        more constructions than trying the multiples of GAMMA_STEP in order.
+
+        The construction only changes when gamma reaches the delay of a merge it rejected,
+        and the feasibility does not always grow with gamma. Hence, starting from zero,
+        after each infeasible construction gamma is raised to the lowest delay rejected or
+        to the next multiple of GAMMA_STEP, whichever is higher. After the first feasible
+        construction, gamma is lowered to the highest delay it accepted (which gives the
+        same construction), and, if the last step skipped some rejected delays, they are
+        tried in order while the constructions are fewer than those of the fixed steps.
+        Each construction replays the decisions of the previous ones that do not depend
+        on the new gamma (see deterministic_solution).
+
+        :return: The deterministic solution.
+
+        """
+        constructions = []
+
+        def construct (gamma):
+            feasible, sol, construction = self.deterministic_solution(gamma, constructions)
+            constructions.append(construction)
+            if feasible:
+                return True, sol, max((delay for _, delay, direct in construction.decisions if direct is not None), default=0.0)
+            return False, None, min((delay for _, delay, direct in construction.decisions if direct is None), default=math.inf)
+
+        # Raise gamma until a construction is feasible
+        gamma, rejected = 0.0, None
+        while True:
+            feasible, sol, delay = construct(gamma)
+            if feasible:
+                break
+            if delay == math.inf:
+                raise Exception("No feasible solution exists for any gamma: the number of vehicles or the maximum travel time are too low.")
+            step = GAMMA_STEP * (math.floor(gamma / GAMMA_STEP) + 1)
+            gamma, rejected = max(delay, step), delay
+
+        # Look for a lower feasible gamma among the rejected delays skipped by the last step
+        steps = gamma / GAMMA_STEP + 1
+        best, gamma = sol, delay
+        while rejected is not None and rejected < gamma and len(constructions) < steps:
+            feasible, sol, delay = construct(rejected)
+            if feasible:
+                best, gamma = sol, delay
+                break
+            rejected = delay
+
+        self.gamma = gamma
+        return best
+
+
+
+    def _search (self, maxiter, dbest, sbest):
+        """
+        This method runs <maxiter> iterations of the biased-randomised search.
+        The solutions improving both the deterministic and stochastic costs are
+        appended to the elites, and the iterations made are added to <iterations>.
+
+        :param maxiter: The number of iterations.
+        :param dbest: The best solution found so far in terms of deterministic cost.
+        :param sbest: The best solution found so far in terms of stochastic cost.
+        :return: The new best solutions in terms of deterministic and stochastic cost.
+
+        """
         # Move paramters and methods to the stack
-        getSolution = self.getSolution
+        profiler = self.profiler
+        getSolution = self._profiled("construction", self.getSolution)
+        evaluate = self._profiled("evaluation", Solution.evaluate)
+        simulate = self._simulate
         beta_min, beta_max = self.beta
         gamma = self.gamma
         max_travel_time = self.max_travel_time
         append = self.elites.append
-
-        # Set starting time
-        start = time.time()
-
-        for _ in range(self.maxiter):
-            feasible, newSol = getSolution (gamma, max_travel_time, random.uniform(beta_min,beta_max))
+        target_error = self.target_error
+        cache = self.cache
+        rng = self.rng
+        deadline = self._deadline
+        max_no_improvement = self.max_no_improvement
+        no_improvement = 0
+        iterations = 0
+
+        for beta in rng.uniform(beta_min, beta_max, maxiter).tolist():
+            if deadline is not None and time.time() >= deadline:
+                break
+
+            iterations += 1
+            no_improvement += 1
+            feasible, newSol = getSolution (gamma, max_travel_time, beta)
+            if profiler is not None:
+                profiler.count("feasible_constructions" if feasible else "infeasible_constructions")
             if feasible:
-                new_deterministic_cost = newSol.evaluate()
+                new_deterministic_cost = evaluate(newSol)
                 if new_deterministic_cost <= dbest.deterministic_cost:
+                    # A tie replaces the best solution, but does not count as an improvement
+                    if new_deterministic_cost < dbest.deterministic_cost:
+                        no_improvement = 0
                     dbest = newSol
-                    newSol.simulate(50, max_travel_time)
+                    if target_error is None:
+                        simulate(newSol, 50, cache=cache)
+                    else:
+                        simulate(newSol, 50, target_error=target_error, batch_size=10, bound=sbest.stochastic_cost, cache=cache)
                     if newSol.stochastic_cost <= sbest.stochastic_cost:
                         sbest = newSol
                         append(newSol)
 
-        [sol.simulate(10_000, self.max_travel_time) for sol in iter(self.elites)]
+            if max_no_improvement is not None and no_improvement >= max_no_improvement:
+                break
+
+        self.iterations += iterations
+        return dbest, sbest
+
+
+
+    def _simulate_elites (self, replications):
+        """
+        This method simulates the elite solutions with <replications> replications.
+
+        If a time limit is set, the replications are reduced to fit in the remaining
+        time, estimating the time needed by a replication with a short pilot simulation
+        of a copy of an elite (so that the elites keep comparable estimates). If not even
+        the pilot fits, the elites keep the estimates made during the search.
+
+        :param replications: The number of replications.
+
+        """
+        elites = list(self.elites)
+
+        if self._deadline is not None:
+            pilot = 100
+            start = time.time()
+            if start + 1e-3 >= self._deadline:
+                return
+            self._simulate(self._rebuild(tuple(r.sequence for r in elites[0].routes)), pilot)
+            now = time.time()
+            replication_time = max(now - start, 1e-9) / pilot * len(elites)
+            replications = min(replications, int((self._deadline - now) / replication_time))
+            if replications < pilot:
+                return
+
+        for sol in elites:
+            self._simulate(sol, replications, target_error=self.target_error, batch_size=500, cache=self.cache)
+
+
+
+    def _rebuild (self, sequences):
+        """
+        This method builds and evaluates a solution given the sequences of node IDs
+        visited by its routes.
+
+        """
+        if self._edges_by_nodes is None:
+            self._edges_by_nodes = {(e.origin.ID, e.end.ID): e for e in self.edges}
+
+        routes = []
+        for sequence in sequences:
+            edges = [self.nodes[sequence[0]].dn_edge]
+            for i, j in zip(sequence[:-1], sequence[1:]):
+                e = self._edges_by_nodes.get((i, j))
+                edges.append(e if e is not None else self._edges_by_nodes[(j, i)].inverse)
+            edges.append(self.nodes[sequence[-1]].nd_edge)
+            r = Route(edges)
+            r.evaluate()
+            routes.append(r)
+
+        sol = Solution(tuple(routes))
+        sol.evaluate()
+        return sol
+
+
+
+    def parallel_search (self, starting_sol):
+        """
+        This method distributes the iterations of the search to a pool of <n_workers>
+        processes. Each worker uses an independent stream of random numbers spawned from
+        the generator of the algorithm, and its elite solutions are merged into the elites
+        of the algorithm. If the algorithm is profiled, the profilers of the workers are
+        merged into its own (so that the times of their phases are summed).
+
+        :param starting_sol: The starting solution.
+        :return: The best solution found in terms of deterministic cost.
+
+        """
+        chunk, rest = divmod(self.maxiter, self.n_workers)
+        rngs = self.rng.spawn(self.n_workers)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.n_workers,
+                                                    initializer=_init_worker,
+                                                    initargs=(self, starting_sol)) as pool:
+            results = list(pool.map(_run_worker,
+                                    [chunk + (1 if i < rest else 0) for i in range(self.n_workers)],
+                                    rngs))
+
+        # The elites are simulated again as the screening done by the workers, so that they
+        # remain comparable even if the final simulation does not take place. The best ones
+        # are simulated first, and the others only as long as the time limit allows. Then,
+        # they are appended from the worst to the best, so that the deque keeps the best ones.
+        candidates = sorted(itertools.chain.from_iterable(elites for elites, _, _, _ in results), key=lambda i: i[1])
+        simulated = []
+        for sequences, _ in candidates[:self.n_elites]:
+            if simulated and self._deadline is not None and time.time() >= self._deadline:
+                break
+            sol = self._rebuild(sequences)
+            self._simulate(sol, 50, cache=self.cache)
+            simulated.append(sol)
+        self.elites.extend(reversed(simulated))
+
+        self.iterations += sum(iterations for _, _, iterations, _ in results)
+        if self.profiler is not None:
+            for _, _, _, profiler in results:
+                self.profiler.merge(profiler)
+
+        return min(itertools.chain([starting_sol], (self._rebuild(sequences) for _, sequences, _, _ in results)),
+                   key=lambda sol: sol.deterministic_cost)
+
+
+
+    def __call__ (self):
+        self._start()
+
+        starting_sol = self._profiled("gamma_search", self.starting_solution)()
+
+        self._profiled("evaluation", Solution.evaluate)(starting_sol)
+        self._simulate(starting_sol, 50, cache=self.cache)
+        self.elites.append(starting_sol)
+
+        # Set starting time
+        start = time.time()
+
+        if self.n_workers > 1:
+            dbest = self._profiled("search", self.parallel_search)(starting_sol)
+        else:
+            dbest, _ = self._profiled("search", self._search)(self.maxiter, starting_sol, starting_sol)
+        self.search_time = time.time() - start
+
+        self._profiled("elites_simulation", self._simulate_elites)(10_000)
         self.sbest = min(self.elites)
         self.dbest = dbest
         self.ctime = time.time() - start
@@ -257,12 +859,10 @@ class Heuristic (Simheuristic):
 
 
     def __call__(self):
-        feasible, self.gamma = False, -10.0
-        while not feasible:
-            self.gamma += 10.0
-            feasible, sol = self.getSolution(self.gamma, self.max_travel_time, BETA_DETERMINISTIC)
+        self._start()
+        sol = self._profiled("gamma_search", self.starting_solution)()
 
-        sol.evaluate()
+        self._profiled("evaluation", Solution.evaluate)(sol)
         self.dbest = sol
 
 
@@ -277,29 +877,44 @@ class BRA (Simheuristic):
 
 
     def __call__ (self):
-        feasible, self.gamma = False, -10.0
-        while not feasible:
-            self.gamma += 10.0
-            feasible, starting_sol = self.getSolution(self.gamma, self.max_travel_time, BETA_DETERMINISTIC)
+        self._start()
+        starting_sol = self._profiled("gamma_search", self.starting_solution)()
 
-        starting_sol.evaluate()
+        evaluate = self._profiled("evaluation", Solution.evaluate)
+        evaluate(starting_sol)
         self.dbest = starting_sol
 
         # Move parameters and methods to the stack
-        getSolution = self.getSolution
+        profiler = self.profiler
+        getSolution = self._profiled("construction", self.getSolution)
         beta_min, beta_max = self.beta
         gamma = self.gamma
         max_travel_time = self.max_travel_time
+        deadline = self._deadline
+        max_no_improvement = self.max_no_improvement
+        no_improvement = 0
+        iterations = 0
 
         # Set starting time
         start = time.time()
 
-        for _ in range(self.maxiter):
+        for beta in self.rng.uniform(beta_min, beta_max, self.maxiter).tolist():
+            if deadline is not None and time.time() >= deadline:
+                break
 
-            feasible, newSol = getSolution (gamma, max_travel_time, random.uniform(beta_min,beta_max))
+            iterations += 1
+            no_improvement += 1
+            feasible, newSol = getSolution (gamma, max_travel_time, beta)
+            if profiler is not None:
+                profiler.count("feasible_constructions" if feasible else "infeasible_constructions")
 
             if feasible:
-                if newSol.evaluate() < self.dbest.deterministic_cost:
+                if evaluate(newSol) < self.dbest.deterministic_cost:
+                    no_improvement = 0
                     self.dbest = newSol
 
-        self.ctime = time.time() - start
+            if max_no_improvement is not None and no_improvement >= max_no_improvement:
+                break
+
+        self.iterations = iterations
+        self.ctime = self.search_time = time.time() - start
@@ -0,0 +1,216 @@
+"""
+This module solves many problems with a grid of settings of the algorithms,
+distributing the runs to a pool of processes, and writes the results in a
+single csv file (one row per run).
+
+The results are written as soon as each run is over, so that an interrupted
+batch can be resumed: the runs already in the output file are skipped.
+
+    python batch.py --filter "A-n" --algorithms BRA Simheuristic --beta 0.1,0.3 0.3,0.5 \
+                    --maxiter 1000 3000 --seeds 0 1 2 --workers 4 --output batch.csv
+
+"""
+import os
+import csv
+import sys
+import argparse
+import itertools
+import collections
+import concurrent.futures
+
+import loader
+import benchmark
+
+
+
+# The settings of a run (see grid)
+SETTINGS = ("file", "algorithm", "seed", "beta", "maxiter", "n_elites", "pvariance", "n_vehicles", "max_travel_time")
+
+# The columns of the output file
+FIELDS = ("file", "algorithm", "seed", "beta_min", "beta_max", "maxiter", "n_elites", "pvariance", "n_vehicles", "max_travel_time",
+          "runtime", "ctime", "gamma", "deterministic_cost", "stochastic_cost", "iterations_per_second")
+
+
+Run = collections.namedtuple("Run", SETTINGS)
+
+
+
+def grid (instances, algorithms = ("Simheuristic",), seeds = (0,), beta = ((.1, .3),), maxiter = (3000,),
+          n_elites = (5,), pvariance = (0.25,), max_travel_time = (None,)):
+    """
+    This method returns the runs of a batch, i.e., the cartesian product of the
+    problems and of the values of each setting.
+
+    :param instances: The problems, as tuples (file, n_vehicles, max_travel_time)
+                    (see benchmark.instances). If the number of vehicles or the
+                    maximum travel time are None, those of the problem are used.
+    :param algorithms: The names of the algorithms (see benchmark.ALGORITHMS).
+    :param seeds: The seeds of the random numbers generators.
+    :param beta: The (min, max) values of the parameter of the quasi-geometric distribution.
+    :param maxiter: The numbers of iterations.
+    :param n_elites: The numbers of elite solutions.
+    :param pvariance: The variances of the travel times as a proportion of the distance.
+    :param max_travel_time: The maximum travel times. If None, those of <instances> are used.
+    :return: A list of Run.
+
+    """
+    runs = []
+    for (filename, n_vehicles, default_tt), algorithm, seed, b, m, e, p, tt in itertools.product(
+            instances, algorithms, seeds, beta, maxiter, n_elites, pvariance, max_travel_time):
+        runs.append(Run(filename, algorithm, seed, tuple(b), m, e, p, n_vehicles, tt if tt is not None else default_tt))
+    return runs
+
+
+
+def _key (row):
+    """
+    This method returns the key identifying a run in the output file, i.e., its
+    settings as strings.
+
+    """
+    return tuple(str(row[field]) for field in FIELDS[:10])
+
+
+
+def _row (run):
+    """
+    This method returns the settings of a run as a row of the output file.
+
+    """
+    row = run._asdict()
+    row["beta_min"], row["beta_max"] = row.pop("beta")
+    return row
+
+
+
+# The problems used by a worker process, received once when the process starts (see solve)
+_instances = None
+
+
+def _init_worker (instances):
+    global _instances
+    _instances = instances
+
+
+
+def _solve (run):
+    """
+    This method is executed by a worker process, and makes a run.
+
+    """
+    result = benchmark.solve(_instances[(run.file, run.pvariance)], run.algorithm, run.n_vehicles, run.max_travel_time,
+                             maxiter=run.maxiter, seed=run.seed, beta=run.beta, n_elites=run.n_elites)
+
+    row = _row(run)
+    row.update((field, result[field]) for field in ("runtime", "ctime", "gamma", "deterministic_cost", "stochastic_cost", "iterations_per_second"))
+    return row
+
+
+
+def solve (runs, output, n_workers = 1, path = loader.DATA_PATH, verbose = False):
+    """
+    This method makes the runs of a batch, and appends their results to the output
+    file. The runs already in the output file (e.g., made by an interrupted batch)
+    are skipped.
+
+    The problems are loaded once and sent to each worker process when it starts,
+    instead of with each run. A run raising an exception (e.g., a problem without
+    feasible solutions) does not stop the batch: it is reported on stderr and not
+    written, so that it is made again when the batch is resumed.
+
+    :param runs: The runs (see grid).
+    :param output: The csv file where the results are written.
+    :param n_workers: The number of worker processes.
+    :param path: The directory of the problems.
+    :param verbose: If True a line is printed at the end of each run.
+    :return: The results of all the runs (including those already in the output file),
+            except the failed ones.
+
+    """
+    runs = list(runs)
+    instances = {(run.file, run.pvariance) : loader.load(run.file, path, run.pvariance, cache=True) for run in runs}
+
+    # The runs without number of vehicles or maximum travel time use those of the problem
+    for i, run in enumerate(runs):
+        instance = instances[(run.file, run.pvariance)]
+        runs[i] = run = run._replace(n_vehicles=run.n_vehicles if run.n_vehicles is not None else instance.n_vehicles,
+                                     max_travel_time=run.max_travel_time if run.max_travel_time is not None else instance.max_travel_time)
+        if run.n_vehicles is None or run.max_travel_time is None:
+            raise Exception(f"The problem {run.file} does not define the number of vehicles or the maximum travel time: "
+                            "they must be given with the problem (see grid).")
+
+    # The header is written only to a new (or empty) output file
+    empty = not os.path.exists(output) or os.path.getsize(output) == 0
+    done = {}
+    if not empty:
+        done = {_key(row) : row for row in benchmark.read(output)}
+
+    pending = [run for run in runs if _key(_row(run)) not in done]
+    required = {(run.file, run.pvariance) for run in pending}
+    instances = {key : instance for key, instance in instances.items() if key in required}
+
+    results = list(done.values())
+    with open(output, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        if empty:
+            writer.writeheader()
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers,
+                                                    initializer=_init_worker,
+                                                    initargs=(instances,)) as pool:
+            futures = {pool.submit(_solve, run) : run for run in pending}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    run = futures[future]
+                    print(f"{run.file} {run.algorithm} seed {run.seed} failed: {e}", file=sys.stderr)
+                    continue
+                writer.writerow(row)
+                file.flush()
+                results.append(row)
+                if verbose:
+                    print(f"[{len(results)}/{len(done) + len(pending)}] {row['file']} {row['algorithm']} seed {row['seed']} "
+                          f"runtime: {row['runtime']:.3f}s stochastic cost: {row['stochastic_cost']}")
+
+    return results
+
+
+
+def main (argv = None):
+    parser = argparse.ArgumentParser(description="Solve many problems with a grid of settings of the algorithms.")
+    parser.add_argument("--filter", default=None, help="Regular expression to select the problems in benchmarks.csv.")
+    parser.add_argument("--files", nargs="+", default=None, help="Problems to solve instead of those in benchmarks.csv "
+                                                                 "(they must define the number of vehicles and the maximum travel time).")
+    parser.add_argument("--algorithms", nargs="+", default=["Simheuristic"], choices=list(benchmark.ALGORITHMS))
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--beta", nargs="+", default=["0.1,0.3"], help="Pairs min,max of the parameter of the quasi-geometric distribution.")
+    parser.add_argument("--maxiter", nargs="+", type=int, default=[3000])
+    parser.add_argument("--n-elites", nargs="+", type=int, default=[5])
+    parser.add_argument("--pvariance", nargs="+", type=float, default=[0.25])
+    parser.add_argument("--max-travel-time", nargs="+", type=float, default=[None])
+    parser.add_argument("--path", default=loader.DATA_PATH, help="Directory of the problems.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="batch_results.csv")
+    args = parser.parse_args(argv)
+
+    if args.files is not None:
+        instances = [(filename, None, None) for filename in args.files]
+    else:
+        instances = benchmark.instances(args.filter)
+
+    runs = grid(instances,
+                algorithms=args.algorithms,
+                seeds=args.seeds,
+                beta=[tuple(float(b) for b in pair.split(",")) for pair in args.beta],
+                maxiter=args.maxiter,
+                n_elites=args.n_elites,
+                pvariance=args.pvariance,
+                max_travel_time=args.max_travel_time)
+    solve(runs, args.output, args.workers, args.path, verbose=True)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+This module runs the algorithms on the benchmark problems listed in
+benchmarks.csv, with fixed seeds, and records runtime and quality of the
+solutions found.
+
+The results can be compared to a baseline (i.e., the results of a previous
+run) to flag speed or quality regressions:
+
+    python benchmark.py --filter "A-n" --output results.csv --baseline baseline.csv
+
+"""
+import os
+import re
+import csv
+import sys
+import time
+import argparse
+
+import loader
+import algorithm
+
+
+
+BENCHMARKS_FILE = os.path.join(loader.BASE_PATH, "benchmarks.csv")
+
+ALGORITHMS = {
+    "Heuristic" : algorithm.Heuristic,
+    "BRA" : algorithm.BRA,
+    "Simheuristic" : algorithm.Simheuristic,
+}
+
+FIELDS = ("file", "algorithm", "seed", "maxiter", "runtime", "ctime", "gamma",
+          "deterministic_cost", "stochastic_cost", "iterations_per_second")
+
+
+
+def instances (pattern = None, filename = BENCHMARKS_FILE):
+    """
+    This method returns the benchmark problems.
+
+    :param pattern: A regular expression used to filter the names of the files.
+    :param filename: The file where the benchmark problems are described.
+    :return: A list of tuples (file, n_vehicles, max_travel_time).
+
+    """
+    with open(filename) as file:
+        rows = [(row["file"], int(row["n_vehicles"]), float(row["max_tt"]))
+                for row in csv.DictReader(file, delimiter="\t")]
+    if pattern is not None:
+        rows = [row for row in rows if re.search(pattern, row[0])]
+    return rows
+
+
+
+def solve (instance, algorithm_name, n_vehicles, max_travel_time, *, maxiter = 3000, seed = 0, **options):
+    """
+    This method solves a problem with one of the algorithms.
+
+    :param instance: The ProblemInstance.
+    :param algorithm_name: The name of the algorithm (see ALGORITHMS).
+    :param n_vehicles: The number of vehicles.
+    :param max_travel_time: The maximum travel time allowed for a single vehicle.
+    :param maxiter: The number of iterations of the algorithm.
+    :param seed: The seed of the random numbers generator.
+    :param options: Other parameters of the algorithm (e.g., beta or n_elites).
+    :return: A dictionary with the results (see FIELDS, except for the file).
+
+    """
+    nodes = instance.build_nodes()
+    edges = instance.build_edges(nodes)
+
+    alg = ALGORITHMS[algorithm_name](nodes, edges, n_vehicles, max_travel_time, maxiter=maxiter, seed=seed, **options)
+
+    start = time.time()
+    alg()
+    runtime = time.time() - start
+
+    iterative = algorithm_name != "Heuristic"
+    return {
+        "algorithm" : algorithm_name,
+        "seed" : seed,
+        "maxiter" : maxiter if iterative else 0,
+        "runtime" : runtime,
+        "ctime" : alg.ctime,
+        "gamma" : alg.gamma,
+        "deterministic_cost" : alg.dbest.deterministic_cost,
+        "stochastic_cost" : alg.sbest.stochastic_cost if alg.sbest is not None else "",
+        "iterations_per_second" : alg.iterations / alg.search_time if iterative and alg.search_time > 0 else "",
+    }
+
+
+
+def run (filename, algorithm_name, n_vehicles, max_travel_time, *, maxiter = 3000, seed = 0, pvariance = 0.25, path = loader.DATA_PATH):
+    """
+    This method solves a benchmark problem with one of the algorithms.
+
+    :param filename: The file of the problem.
+    :param algorithm_name: The name of the algorithm (see ALGORITHMS).
+    :param n_vehicles: The number of vehicles.
+    :param max_travel_time: The maximum travel time allowed for a single vehicle.
+    :param maxiter: The number of iterations of the algorithm.
+    :param seed: The seed of the random numbers generator.
+    :param pvariance: The variance of the travel times as a proportion of the distance.
+    :param path: The directory where the file is.
+    :return: A dictionary with the results (see FIELDS).
+
+    """
+    instance = loader.load(filename, path, pvariance, cache=True)
+    result = solve(instance, algorithm_name, n_vehicles, max_travel_time, maxiter=maxiter, seed=seed)
+    return dict(file=filename, **result)
+
+
+
+def write (results, filename):
+    """
+    This method writes the results in a csv file.
+
+    """
+    with open(filename, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+
+def read (filename):
+    """
+    This method reads the results written by <write>.
+
+    """
+    with open(filename, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+
+def compare (results, baseline, time_tolerance = 0.25, cost_tolerance = 0.01, time_margin = 0.05):
+    """
+    This method compares some results to a baseline, and returns the regressions
+    found, i.e., runs slower or reaching worse costs than the baseline.
+    Runs are matched by file, algorithm, seed and maxiter.
+
+    :param results: The new results.
+    :param baseline: The results used as baseline.
+    :param time_tolerance: The relative increase of runtime considered acceptable.
+    :param cost_tolerance: The relative increase of cost considered acceptable.
+    :param time_margin: The absolute increase of runtime (in seconds) always considered
+                        acceptable, to avoid flagging the noise of very short runs.
+    :return: A list of messages describing the regressions.
+
+    """
+    key = lambda row: (row["file"], row["algorithm"], str(row["seed"]), str(row["maxiter"]))
+    reference = {key(row) : row for row in baseline}
+
+    regressions = []
+    for row in results:
+        base = reference.get(key(row))
+        if base is None:
+            continue
+
+        if float(row["runtime"]) > float(base["runtime"]) * (1 + time_tolerance) + time_margin:
+            regressions.append(f"{row['file']} {row['algorithm']}: runtime {float(row['runtime']):.3f}s (baseline {float(base['runtime']):.3f}s)")
+
+        for cost in ("deterministic_cost", "stochastic_cost"):
+            if row[cost] == "" or base[cost] == "":
+                continue
+            if float(row[cost]) > float(base[cost]) * (1 + cost_tolerance) + 1e-9:
+                regressions.append(f"{row['file']} {row['algorithm']}: {cost} {float(row[cost]):.3f} (baseline {float(base[cost]):.3f})")
+
+    return regressions
+
+
+
+def main (argv = None):
+    parser = argparse.ArgumentParser(description="Run the algorithms on the benchmark problems.")
+    parser.add_argument("--filter", default=None, help="Regular expression to select the problems.")
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--maxiter", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pvariance", type=float, default=0.25)
+    parser.add_argument("--path", default=loader.DATA_PATH, help="Directory of the problems.")
+    parser.add_argument("--output", default="benchmark_results.csv")
+    parser.add_argument("--baseline", default=None, help="Results of a previous run to compare with.")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--cost-tolerance", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    results = []
+    for filename, n_vehicles, max_travel_time in instances(args.filter):
+        for algorithm_name in args.algorithms:
+            result = run(filename, algorithm_name, n_vehicles, max_travel_time,
+                         maxiter=args.maxiter, seed=args.seed, pvariance=args.pvariance, path=args.path)
+            results.append(result)
+            print(f"{filename} {algorithm_name} runtime: {result['runtime']:.3f}s deterministic cost: {result['deterministic_cost']} stochastic cost: {result['stochastic_cost']}")
+
+    write(results, args.output)
+
+    if args.baseline is not None:
+        regressions = compare(results, read(args.baseline), args.time_tolerance, args.cost_tolerance)
+        for message in regressions:
+            print("REGRESSION", message)
+        return 1 if regressions else 0
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import collections
+
+
+
+class SimulationCache (object):
+    """
+    An instance of this class is a bounded (least recently used) cache of
+    the results of the stochastic simulation of routes.
+
+    The key is made by the sequence of customers visited by the route (in the
+    order they are visited, since the direction matters because of the time
+    windows) and the maximum travel time. The value is the state of the
+    simulation of the route (see Route.simulation_state), so that a route met
+    again can reuse the replications already made, and extend them if more are
+    required.
+
+    """
+
+    def __init__ (self, maxsize = 10_000):
+        """
+        Constructor.
+
+        :param maxsize: The maximum number of routes kept in cache.
+
+        :attr hits: The number of requests answered by the cache.
+        :attr misses: The number of requests not answered by the cache.
+
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+
+
+    def __len__ (self):
+        return len(self._data)
+
+
+    def get (self, key):
+        """
+        This method returns the value cached for <key>, or None.
+
+        """
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+
+    def put (self, key, value):
+        """
+        This method caches <value> for <key>, discarding the least recently
+        used entry if the cache is full.
+
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
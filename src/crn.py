@@ -0,0 +1,74 @@
+import numpy as np
+
+
+
+class CommonRandomNumbers (object):
+    """
+    An instance of this class provides common random numbers for the stochastic
+    simulation of the routes.
+
+    Each edge has its own stream of standard normal variates, generated from the
+    seed and the IDs of its nodes, so that an edge (and its inverse) has the same
+    travel time in the same replication of any route it belongs to. The lognormal
+    travel time of replication r is then exp(mu + sigma * z[r]).
+
+    Simulating two solutions with the same numbers makes the estimates of their
+    stochastic costs positively correlated, and their difference much less noisy
+    than with independent replications.
+
+    The variates are generated lazily, when an edge is simulated for the first
+    time, and extended when more replications are required. Since the replications
+    are addressed by position, a simulation can be extended (e.g., after being
+    restored from a SimulationCache) using the next variates of the streams.
+
+    """
+
+    def __init__ (self, seed = None):
+        """
+        Constructor.
+
+        :param seed: The seed of the streams (if None, a random one is used).
+
+        """
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._streams = {}
+
+
+    def __len__ (self):
+        return len(self._streams)
+
+
+    def edge_normals (self, edge, start, stop):
+        """
+        This method returns the standard normal variates of an edge for the
+        replications from <start> (included) to <stop> (excluded).
+
+        """
+        i, j = edge.origin.ID, edge.end.ID
+        key = (i, j) if i < j else (j, i)
+
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = [np.random.default_rng([self.seed, *key]), np.empty(0)]
+            self._streams[key] = stream
+
+        generator, values = stream
+        if len(values) < stop:
+            # The stream is (at least) doubled to make the extensions infrequent.
+            values = np.concatenate((values, generator.standard_normal(max(stop, 2 * len(values)) - len(values))))
+            stream[1] = values
+        return values[start:stop]
+
+
+    def normals (self, edges, start, stop):
+        """
+        This method returns the standard normal variates of the edges of a route
+        for the replications from <start> (included) to <stop> (excluded).
+
+        :return: A (replications x edges) matrix.
+
+        """
+        z = np.empty((stop - start, len(edges)))
+        for k, e in enumerate(edges):
+            z[:, k] = self.edge_normals(e, start, stop)
+        return z
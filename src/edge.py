@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 
@@ -11,16 +10,35 @@ class Edge (object):
     For the moment, we consider the edges as direct arcs (i.e., the edge connecting
     node A to node B is different by the edge connecting node B to node A).
 
+    Edges are lightweight objects (they use __slots__), and the inverse edge,
+    if not explicitly set, is built the first time it is required.
+
     """
+    __slots__ = ("origin", "end", "deterministic_travel_time", "variance", "mu", "sigma", "saving", "_inverse")
+
+    def __init__(self, origin, end, deterministic_travel_time, variance, lognormal=None):
+        """
+        Constructor.
 
-    def __init__(self, origin, end, deterministic_travel_time, variance):
+        :param origin: The origin node.
+        :param end: The destination node.
+        :param deterministic_travel_time: The expected travel time.
+        :param variance: The variance of the travel time.
+        :param lognormal: The parameters (mu, sigma) of the lognormal distribution
+                        of the travel time. If not provided they are computed, otherwise
+                        they are shared (e.g., with the inverse edge).
 
+        """
         self.origin = origin 
         self.end = end
         
         self.deterministic_travel_time = deterministic_travel_time
         self.variance = variance
 
+        if lognormal is None:
+            lognormal = self.lognormal_parameters(deterministic_travel_time, variance)
+        self.mu, self.sigma = lognormal
+
         self.saving = 0  
         self.inverse = None
 
@@ -30,26 +48,74 @@ class Edge (object):
     
     
     @staticmethod
-    def _rand_lognormal (mean, variance):
+    def lognormal_parameters (mean, variance):
+        """
+        This method returns the parameters (mu, sigma) of the lognormal distribution
+        used to generate the stochastic travel times.
+        For a null travel time, mu is minus infinity and sigma is zero, so that the
+        sampled travel time is always zero.
+
+        """
         if mean == 0:
-            return 0
+            return -math.inf, 0.0
         
         phi = math.sqrt(variance + mean**2)
         mu = math.log((mean**2) / phi)
         sigma = math.sqrt(math.log((phi**2) / (mean**2)))
         
-        return np.random.lognormal(mean=mu, sigma=sigma)
+        return mu, sigma
+
+
+    @property
+    def lognormal (self):
+        return self.mu, self.sigma
+
+
+    @property
+    def inverse (self):
+        """
+        The edge connecting the same nodes in the opposite direction.
+
+        """
+        if self._inverse is None:
+            inverse = Edge(self.end, self.origin, self.deterministic_travel_time, self.variance, self.lognormal)
+            inverse.saving = self.saving
+            inverse._inverse = self
+            self._inverse = inverse
+        return self._inverse
+
+
+    @inverse.setter
+    def inverse (self, edge):
+        self._inverse = edge
 
 
     
     @property
     def stochastic_travel_time (self):
         """
-        This method returns a stochastic cost/travel-time.
+        This method returns a stochastic cost/travel-time, drawn from a new
+        numpy Generator (use sample to draw from a given one).
         
         NOTE: This is not a proper lognormal distribution, with the average 
         and standard deviation givens. This is a lognormal distribution where
         the mode corresponds to the <mu> given.
         
         """
-        return self._rand_lognormal(self.deterministic_travel_time, self.variance)
+        if self.deterministic_travel_time == 0:
+            return 0
+        return float(self.sample(None))
+
+
+
+    def sample (self, size, rng=None):
+        """
+        This method returns an array of <size> stochastic travel times
+        drawn in a single call.
+
+        :param size: The number of travel times.
+        :param rng: The numpy Generator used (if None, a new one is created).
+
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        return rng.lognormal(mean=self.mu, sigma=self.sigma, size=size)
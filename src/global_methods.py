@@ -1,15 +1,35 @@
+import os
+import math
 import numpy as np
+import bisect
 import collections
-import functools
-import statistics
+import itertools
+
+from sketch import QuantileSketch
 
 _intercept = 5.42
 _coef = np.array([0.98, 452.25])
+_delay_coef, _importance_coef = _coef.tolist()
 
 
-@functools.lru_cache(maxsize=126)
 def predict (delay, importance):
-    return _intercept + np.dot(_coef, np.array([delay,importance])) if delay > 0 else 0
+    """
+    This method returns the compensation requested by a customer for a delay.
+    It is the scalar version of <predict_vectorized>, and does not use numpy.
+
+    """
+    return _intercept + (_delay_coef * delay + _importance_coef * importance) if delay > 0 else 0
+
+
+
+def predict_vectorized (delays, importances):
+    """
+    This method returns the compensations requested by the customers for
+    the delays, given as arrays (broadcasting is supported).
+
+    """
+    delays = np.asarray(delays, dtype=np.float64)
+    return np.where(delays > 0, _intercept + (_delay_coef * delays + _importance_coef * np.asarray(importances, dtype=np.float64)), 0.0)
 
 
 
@@ -26,21 +46,252 @@ def evaluate (edges, current_travel_time=0, current_delay_cost=0.0):
 
 
 
-def simulate (edges, maxiter, max_travel_time):
-    results = collections.deque()
-    append = results.append
-    
-    for i in range(maxiter):
+DelayProfile = collections.namedtuple("DelayProfile", ("start", "arrival", "cost", "slacks", "weights"))
+
+
+
+def profile (steps):
+    """
+    This method computes the delay profile of a sequence of customers visited
+    starting from the depot, i.e., the aggregates needed to know in O(log n) the
+    delay cost of the sequence when all the arrivals are shifted by a certain time
+    (see shifted_cost).
+
+    The delay cost of a customer visited at <arrival> + <shift> is positive only
+    when <shift> is larger than its slack (i.e., <close> - <arrival>), and in that
+    case it is linear in <shift>. Hence, the slacks are kept sorted and the
+    constant terms of the costs are accumulated in the same order.
+
+    :param steps: The (travel time, customer) pairs from the depot to the last customer.
+
+    :return: | start: The arrival time at the first customer.
+             | arrival: The arrival time at the last customer.
+             | cost: The delay cost of the sequence.
+             | slacks: The sorted slacks of the customers.
+             | weights: The cumulated constant terms of the delay costs (in order of slack).
+
+    """
+    travel_time, delay_cost, start = 0, 0.0, None
+    terms = []
+    for tt, node in steps:
+        travel_time += tt
+        if start is None:
+            start = travel_time
+        delay = max(travel_time - node.close, 0)
+        delay_cost += predict(delay, node.importance)
+        terms.append((node.close - travel_time, _intercept + _delay_coef * (travel_time - node.close) + _importance_coef * node.importance))
+
+    terms.sort(key=lambda i: i[0])
+    slacks = [slack for slack, _ in terms]
+    weights = list(itertools.accumulate((weight for _, weight in terms), initial=0.0))
+    return DelayProfile(start, travel_time, delay_cost, slacks, weights)
+
+
+
+def shifted_cost (profile, shift):
+    """
+    This method returns the delay cost of a sequence of customers when all the
+    arrival times are shifted by <shift>.
+
+    :param profile: The DelayProfile of the sequence.
+    :param shift: The time added to all the arrivals.
+
+    """
+    n = bisect.bisect_left(profile.slacks, shift)
+    return profile.weights[n] + _delay_coef * shift * n
+
+
+
+
+def _lognormal_parameters (edges):
+    """
+    This method returns the parameters <mu> and <sigma> of the lognormal
+    distributions of the travel times of the edges, as two arrays.
+
+    """
+    mu = np.fromiter((e.mu for e in edges), dtype=np.float64, count=len(edges))
+    sigma = np.fromiter((e.sigma for e in edges), dtype=np.float64, count=len(edges))
+    return mu, sigma
+
+
+
+def _sample_vectorized (edges, maxiter, max_travel_time, normals=None, rng=None):
+    """
+    Vectorized version of the stochastic simulation.
+
+    The travel times of all the replications are drawn in a single
+    (replications x edges) matrix, the arrival times are the cumulative
+    sums along the edges, and the delay costs are computed as array
+    operations. Replications exceeding the maximum travel time are
+    discarded as in the iterative version.
+
+    If a (replications x edges) matrix of standard normal variates is
+    given, the travel times are obtained from it instead of being drawn.
+
+    """
+    mu, sigma = _lognormal_parameters(edges)
+    close = np.array([e.end.close for e in edges], dtype=np.float64)
+    importance = np.array([e.end.importance for e in edges], dtype=np.float64)
+
+    if normals is None:
+        travel_times = rng.lognormal(mean=mu, sigma=sigma, size=(maxiter, len(edges)))
+    else:
+        travel_times = np.exp(mu + sigma * normals)
+    arrivals = np.cumsum(travel_times, axis=1)
+    completed = arrivals[:, -1] <= max_travel_time
+
+    delays = np.maximum(arrivals[completed] - close, 0)
+    return predict_vectorized(delays, importance).sum(axis=1)
+
+
+
+def sample (edges, maxiter, max_travel_time, vectorized=False, normals=None, rng=None):
+    """
+    This method simulates <maxiter> replications of a route, and returns the
+    delay costs of the replications completed within <max_travel_time>.
+
+    :param edges: The edges of the route.
+    :param maxiter: The number of replications.
+    :param max_travel_time: The maximum travel time of the route.
+    :param vectorized: If True the replications are simulated all together
+                        using array operations.
+    :param normals: The (maxiter x edges) standard normal variates the travel
+                    times are computed from (e.g., common random numbers).
+                    They are only supported by the vectorized simulation,
+                    which is always used when they are given.
+    :param rng: The numpy Generator the travel times are drawn from (if None,
+                a new one is created).
+    :return: The array of delay costs (one per completed replication).
+
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if vectorized or normals is not None:
+        return _sample_vectorized(edges, maxiter, max_travel_time, normals, rng)
+
+    # The travel times of all the replications are drawn in a single call
+    mu, sigma = _lognormal_parameters(edges)
+    travel_times = rng.lognormal(mean=mu, sigma=sigma, size=(maxiter, len(edges))).tolist()
+    nodes = [e.end for e in edges]
+    results = np.empty(maxiter, dtype=np.float64)
+    n = 0
+
+    for replication in travel_times:
         travel_time, delay_cost = 0, 0.0
-        for e in iter(edges):
-            node = e.end
-            travel_time += e.stochastic_travel_time
+        for tt, node in zip(replication, nodes):
+            travel_time += tt
             if travel_time > max_travel_time:
                 break
-            
+
             delay = max(travel_time - node.close, 0)
             delay_cost += predict(delay, node.importance)
 
         else:
-            append(delay_cost)
-    return statistics.mean(results)
+            results[n] = delay_cost
+            n += 1
+    return results[:n]
+
+
+
+def simulate (edges, maxiter, max_travel_time, vectorized=False, rng=None):
+    """
+    This method simulates a route, and returns the mean delay cost of the
+    replications completed within <max_travel_time>, or infinity if none of
+    them is completed (as Route.simulate).
+
+    :param edges: The edges of the route.
+    :param maxiter: The number of replications.
+    :param max_travel_time: The maximum travel time of the route.
+    :param vectorized: If True the replications are simulated all together
+                        using array operations.
+    :param rng: The numpy Generator the travel times are drawn from (if None,
+                a new one is created).
+
+    """
+    completed, mean, _ = merge_statistics(0, 0.0, 0.0, sample(edges, maxiter, max_travel_time, vectorized, rng=rng))
+    return mean if completed > 0 else math.inf
+
+
+
+def merge_statistics (count, mean, m2, costs):
+    """
+    This method merges the statistics of a set of delay costs with those of
+    a new array of costs (see Chan et al., "Updating formulae and a pairwise
+    algorithm for computing sample variances").
+
+    :param count: The number of costs so far.
+    :param mean: The mean of the costs so far.
+    :param m2: The sum of squared deviations from the mean of the costs so far.
+    :param costs: The array of new costs.
+    :return: The count, mean and sum of squared deviations of all the costs.
+
+    """
+    n = len(costs)
+    if n == 0:
+        return count, mean, m2
+    new_mean = float(costs.mean())
+    new_m2 = float(((costs - new_mean)**2).sum())
+    if count == 0:
+        return n, new_mean, new_m2
+    total = count + n
+    delta = new_mean - mean
+    return total, mean + delta * n / total, m2 + new_m2 + delta**2 * count * n / total
+
+
+
+
+SimulationStatistics = collections.namedtuple("SimulationStatistics", ("replications", "completed", "mean", "variance", "quantiles"))
+
+
+
+def stream (edges, maxiter, max_travel_time, batch_size=10_000, vectorized=True, quantiles=(0.5, 0.9, 0.95, 0.99), relative_accuracy=0.01, spill=None, crn=None, rng=None):
+    """
+    This method simulates <maxiter> replications of a route in batches, and
+    yields the statistics of the replications made so far after each batch.
+
+    The memory used does not depend on <maxiter>: the mean and variance are
+    updated batch by batch, and the quantiles are estimated by a QuantileSketch.
+    The delay costs of the completed replications can be spilled to a binary
+    file of float64 (e.g., to be read again with numpy.fromfile or numpy.memmap).
+
+    :param edges: The edges of the route.
+    :param maxiter: The number of replications.
+    :param max_travel_time: The maximum travel time of the route.
+    :param batch_size: The replications of each batch.
+    :param vectorized: If True the replications are simulated all together
+                        using array operations.
+    :param quantiles: The quantiles of the delay cost yielded.
+    :param relative_accuracy: The relative accuracy of the quantiles.
+    :param spill: The path or binary file the delay costs are written to (if any).
+    :param crn: The CommonRandomNumbers used for the replications (if any).
+    :param rng: The numpy Generator the travel times are drawn from (if None,
+                a new one is created).
+
+    :return: A generator of SimulationStatistics, where the statistics concern the
+            completed replications and <quantiles> is a dictionary {q : quantile}.
+
+    """
+    edges = tuple(edges)
+    rng = rng if rng is not None else np.random.default_rng()
+    sketch = QuantileSketch(relative_accuracy)
+    completed, mean, m2 = 0, 0.0, 0.0
+
+    file = open(spill, "wb") if isinstance(spill, (str, os.PathLike)) else spill
+    try:
+        for start in range(0, maxiter, batch_size):
+            stop = min(start + batch_size, maxiter)
+            normals = crn.normals(edges, start, stop) if crn is not None else None
+            costs = sample(edges, stop - start, max_travel_time, vectorized, normals, rng)
+
+            completed, mean, m2 = merge_statistics(completed, mean, m2, costs)
+            sketch.update(costs)
+            if file is not None:
+                costs.tofile(file)
+
+            yield SimulationStatistics(replications=stop,
+                                       completed=completed,
+                                       mean=mean if completed > 0 else math.nan,
+                                       variance=m2 / (completed - 1) if completed > 1 else math.nan,
+                                       quantiles={q : sketch.quantile(q) for q in quantiles} if completed > 0 else {})
+    finally:
+        if file is not None and file is not spill:
+            file.close()
@@ -0,0 +1,175 @@
+"""
+This module reads the problems in the data directory as ProblemInstance.
+To make the following reads faster, a problem can be cached together with the
+arrays computed from it, also when a whole directory is read.
+
+Two formats are supported:
+
+    - The *_input_nodes.txt files, with a row of whitespace-separated values
+      per node (x, y, demand and optionally the opening and closing times),
+      where the first node is the depot.
+
+    - The p*.txt files of the Chao et al. team orienteering problems:
+
+            n;<number of points>
+            m;<number of vehicles>
+            tmax;<maximum travel time>
+            <x>;<y>;<score>
+            ...
+
+      where the first point is the starting depot and the last one is the
+      ending depot. The score of the customers is used as demand.
+      NOTE: The routes of this package start and end at the same depot, so the
+      ending depot is dropped.
+
+"""
+import os
+import glob
+import pickle
+import hashlib
+import numpy as np
+
+import problem
+
+
+
+BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+DATA_PATH = os.path.join(BASE_PATH, "data", "")
+
+# The directory (relative to the one of the problems) where the problems are cached
+CACHE_DIR = ".cache"
+
+
+
+def read_nodes (filename, path = DATA_PATH):
+    """
+    This method reads a problem from a *_input_nodes.txt file.
+    As in util.readfile, the coordinates are truncated to integers, and files
+    without time windows are given an opening time of 0 and no closing time.
+
+    :return: The data of the problem as a dictionary of arrays (see ProblemInstance).
+
+    """
+    with open(os.path.join(path, filename)) as file:
+        lines = file.read().split("\n")
+    columns = len(lines[0].split())
+    values = np.array(" ".join(lines).split(), dtype=np.float64).reshape(-1, columns)
+
+    return {
+        "x" : np.trunc(values[:, 0]),
+        "y" : np.trunc(values[:, 1]),
+        "demand" : values[:, 2].astype(np.int64),
+        "open" : values[:, 3] if columns > 3 else np.zeros(len(values)),
+        "close" : values[:, 4] if columns > 4 else np.full(len(values), np.inf),
+    }
+
+
+
+def read_chao (filename, path = DATA_PATH):
+    """
+    This method reads a team orienteering problem of Chao et al. from a p*.txt file.
+
+    :return: The data of the problem as a dictionary of arrays (see ProblemInstance).
+
+    """
+    with open(os.path.join(path, filename)) as file:
+        header = [file.readline().split(";") for _ in range(3)]
+        values = np.array(file.read().replace(";", " ").split(), dtype=np.float64).reshape(-1, 3)
+
+    header = {key.strip() : value.strip() for key, value in header}
+    n = int(header["n"])
+    if len(values) != n:
+        raise Exception(f"The file {filename} declares {n} points but contains {len(values)}.")
+
+    # Drop the ending depot
+    values = values[:-1]
+    return {
+        "x" : values[:, 0],
+        "y" : values[:, 1],
+        "demand" : values[:, 2],
+        "open" : np.zeros(len(values)),
+        "close" : np.full(len(values), np.inf),
+        "n_vehicles" : int(header["m"]),
+        "max_travel_time" : float(header["tmax"]),
+        "integer_distances" : False,
+    }
+
+
+
+def _is_chao (filename, path):
+    with open(os.path.join(path, filename)) as file:
+        return file.readline().startswith("n;")
+
+
+
+def read (filename, path = DATA_PATH):
+    """
+    This method reads a problem, whatever its format.
+
+    :return: The data of the problem as a dictionary (see ProblemInstance).
+
+    """
+    return read_chao(filename, path) if _is_chao(filename, path) else read_nodes(filename, path)
+
+
+
+def _instance_file (filename, path, pvariance):
+    """
+    This method returns the file where a problem is cached, which depends on the
+    content of the file of the problem (so that a modified file is not confused
+    with the cached one) and on the variance of the travel times.
+
+    """
+    with open(os.path.join(path, filename), "rb") as file:
+        digest = hashlib.sha1(file.read()).hexdigest()
+    return os.path.join(path, CACHE_DIR, f"{filename}.{digest[:16]}.{pvariance!r}.pkl")
+
+
+
+def load (filename, path = DATA_PATH, pvariance = 0.25, cache = False):
+    """
+    This method reads a problem, whatever its format.
+
+    If <cache> is True, the problem is cached together with its distances,
+    variances, lognormal parameters and sorted savings (see ProblemInstance.save),
+    and the following reads of the same file with the same <pvariance> skip both
+    parsing and computations.
+
+    :param filename: The name of the file.
+    :param path: The directory where the file is.
+    :param pvariance: The variance of the travel times as a proportion of the distance.
+    :param cache: If True the problem is read from (and written to) the cache.
+    :return: The ProblemInstance.
+
+    """
+    if not cache:
+        return problem.ProblemInstance(pvariance=pvariance, **read(filename, path))
+
+    instance_file = _instance_file(filename, path, pvariance)
+    try:
+        with open(instance_file, "rb") as file:
+            return problem.ProblemInstance.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    instance = problem.ProblemInstance(pvariance=pvariance, **read(filename, path))
+    os.makedirs(os.path.dirname(instance_file), exist_ok=True)
+    with open(instance_file, "wb") as file:
+        instance.save(file)
+    return instance
+
+
+
+def load_directory (path = DATA_PATH, pattern = "*.txt", pvariance = 0.25, cache = True):
+    """
+    This method reads all the problems in a directory.
+
+    :param path: The directory.
+    :param pattern: The pattern (glob) of the names of the files.
+    :param pvariance: The variance of the travel times as a proportion of the distance.
+    :param cache: If True each problem is read from (and written to) the cache (see load).
+    :return: A dictionary {file name : ProblemInstance} sorted by file name.
+
+    """
+    filenames = sorted(os.path.basename(f) for f in glob.glob(os.path.join(path, pattern)))
+    return {filename : load(filename, path, pvariance, cache) for filename in filenames}
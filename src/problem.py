@@ -0,0 +1,222 @@
+import pickle
+import numpy as np
+
+import node
+import edge
+
+
+
+class ProblemInstance (object):
+    """
+    An instance of this class represents a problem as a set of contiguous
+    arrays, instead of a graph of Python objects.
+
+    Node 0 is the depot, and the position of each node in the arrays
+    corresponds to its ID.
+
+    The distances, variances and savings between all the nodes are computed at
+    once using broadcasting, and the Edge instances are only built when the
+    algorithm needs them.
+
+    """
+
+    def __init__ (self, x, y, open, close, demand, pvariance = 0.25, n_vehicles = None, max_travel_time = None, integer_distances = True):
+        """
+        Constructor.
+
+        :param x: The x coordinates of the nodes.
+        :param y: The y coordinates of the nodes.
+        :param open: The opening times of the nodes.
+        :param close: The closing times of the nodes.
+        :param demand: The quantities of products sold to the customers.
+        :param pvariance: The variance of the travel times as a proportion of the distance.
+        :param n_vehicles: The number of vehicles, if given by the problem.
+        :param max_travel_time: The maximum travel time of a vehicle, if given by the problem.
+        :param integer_distances: If True the distances are truncated to integers (as for
+                                the problems in *_input_nodes.txt files).
+
+        :attr coordinates: The (n x 2) matrix of coordinates.
+        :attr importance: The importance of the customers.
+        :attr distance: The (n x n) matrix of distances.
+        :attr variance: The (n x n) matrix of variances of the travel times.
+        :attr savings: The (n x n) matrix of savings according to Clark-Wright.
+        :attr mu: The (n x n) matrix of parameters mu of the lognormal travel times (computed lazily).
+        :attr sigma: The (n x n) matrix of parameters sigma of the lognormal travel times (computed lazily).
+
+        """
+        self.coordinates = np.column_stack((np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)))
+        self.open = np.asarray(open, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.demand = np.asarray(demand)
+        self.importance = self.demand / self.demand.sum()
+        self.pvariance = pvariance
+        self.n_vehicles = n_vehicles
+        self.max_travel_time = max_travel_time
+        self.integer_distances = integer_distances
+
+        diff = self.coordinates[:, np.newaxis, :] - self.coordinates[np.newaxis, :, :]
+        self.distance = np.sqrt((diff**2).sum(axis=2))
+        if integer_distances:
+            self.distance = self.distance.astype(np.int64)
+        self.variance = (pvariance * self.distance)**2
+        self.savings = self.distance[:, :1] + self.distance[:1, :] - self.distance
+        self.mu = None
+        self.sigma = None
+        self._order = None
+
+
+    @classmethod
+    def from_nodes (cls, nodes, pvariance = 0.25):
+        """
+        This method builds the problem instance from a set of nodes.
+
+        """
+        return cls(x=[n.x for n in nodes],
+                   y=[n.y for n in nodes],
+                   open=[n.open for n in nodes],
+                   close=[n.close for n in nodes],
+                   demand=[n.demand for n in nodes],
+                   pvariance=pvariance)
+
+
+    def __len__ (self):
+        return len(self.coordinates)
+
+
+    def build_nodes (self):
+        """
+        This method returns the nodes of the problem as a tuple of Node instances.
+
+        """
+        return tuple(node.Node(i, x, y, open=o, close=c, demand=d, importance=imp)
+                     for i, (x, y, o, c, d, imp) in enumerate(zip(self.coordinates[:, 0].tolist(),
+                                                                  self.coordinates[:, 1].tolist(),
+                                                                  self.open.tolist(),
+                                                                  self.close.tolist(),
+                                                                  self.demand.tolist(),
+                                                                  self.importance.tolist())))
+
+
+    def savings_order (self):
+        """
+        This method returns the pairs of customers (i, j), with i < j, sorted
+        by decreasing saving. Pairs with the same saving keep their lexicographic
+        order.
+
+        :return: The arrays of origins and destinations.
+
+        """
+        if self._order is None:
+            rows, cols = np.triu_indices(len(self) - 1, k=1)
+            rows, cols = rows + 1, cols + 1
+            order = np.argsort(-self.savings[rows, cols], kind="stable")
+            self._order = (rows[order], cols[order])
+        return self._order
+
+
+    def lognormal_parameters (self):
+        """
+        This method computes the parameters of the lognormal distributions of
+        the travel times between all the nodes.
+
+        They are computed once per distinct distance by Edge.lognormal_parameters,
+        so that they are exactly the same of the edges built without them.
+
+        :return: The matrices mu and sigma.
+
+        """
+        if self.mu is None:
+            distances, inverse = np.unique(self.distance, return_inverse=True)
+            variances = (self.pvariance * distances)**2
+            mu, sigma = np.array([edge.Edge.lognormal_parameters(d, v) for d, v in zip(distances.tolist(), variances.tolist())]).T
+            self.mu = mu[inverse].reshape(self.distance.shape)
+            self.sigma = sigma[inverse].reshape(self.distance.shape)
+        return self.mu, self.sigma
+
+
+    def save (self, file):
+        """
+        This method writes the problem in a binary file, together with the distances,
+        variances, savings, lognormal parameters and order of the savings, so that
+        <load> does not compute them again.
+
+        NOTE: The arrays are pickled, since reading them from npy or npz files is
+        slower than computing them again for problems of this size.
+
+        :param file: The binary file.
+
+        """
+        mu, sigma = self.lognormal_parameters()
+        rows, cols = self.savings_order()
+        data = {
+            "coordinates" : self.coordinates,
+            "open" : self.open, "close" : self.close, "demand" : self.demand,
+            "pvariance" : self.pvariance,
+            "n_vehicles" : self.n_vehicles,
+            "max_travel_time" : self.max_travel_time,
+            "integer_distances" : self.integer_distances,
+            "distance" : self.distance, "variance" : self.variance, "savings" : self.savings,
+            "mu" : mu, "sigma" : sigma, "rows" : rows, "cols" : cols,
+        }
+        pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+    @classmethod
+    def load (cls, file):
+        """
+        This method reads a problem written by <save>.
+
+        :param file: The binary file.
+
+        """
+        data = pickle.load(file)
+
+        instance = cls.__new__(cls)
+        instance.coordinates = data["coordinates"]
+        instance.open, instance.close, instance.demand = data["open"], data["close"], data["demand"]
+        instance.importance = instance.demand / instance.demand.sum()
+        instance.pvariance = data["pvariance"]
+        instance.n_vehicles = data["n_vehicles"]
+        instance.max_travel_time = data["max_travel_time"]
+        instance.integer_distances = data["integer_distances"]
+        instance.distance, instance.variance, instance.savings = data["distance"], data["variance"], data["savings"]
+        instance.mu, instance.sigma = data["mu"], data["sigma"]
+        instance._order = (data["rows"], data["cols"])
+        return instance
+
+
+    def build_edges (self, nodes):
+        """
+        This method construct the edges connecting the nodes to each other and
+        each node to the depot.
+        The inverse edges of the savings list are built lazily when required.
+
+        :param nodes: The nodes of the problem, in the same order of the arrays.
+        :return: The edges connecting the nodes sorted by savings
+
+        """
+        depot = nodes[0]
+        mu, sigma = self.lognormal_parameters()
+        distances, variances = self.distance[0].tolist(), self.variance[0].tolist()
+        lognormals = list(zip(mu[0].tolist(), sigma[0].tolist()))
+        for n in nodes[1:]:
+            dn_edge = edge.Edge(depot, n, deterministic_travel_time=distances[n.ID], variance=variances[n.ID], lognormal=lognormals[n.ID])
+            nd_edge = edge.Edge(n, depot, deterministic_travel_time=distances[n.ID], variance=variances[n.ID], lognormal=dn_edge.lognormal)
+            dn_edge.inverse = nd_edge
+            nd_edge.inverse = dn_edge
+            n.dn_edge = dn_edge
+            n.nd_edge = nd_edge
+
+        rows, cols = self.savings_order()
+        edges = list()
+        for i, j, distance, variance, saving, lognormal in zip(rows.tolist(),
+                                                               cols.tolist(),
+                                                               self.distance[rows, cols].tolist(),
+                                                               self.variance[rows, cols].tolist(),
+                                                               self.savings[rows, cols].tolist(),
+                                                               zip(mu[rows, cols].tolist(), sigma[rows, cols].tolist())):
+            ijEdge = edge.Edge(nodes[i], nodes[j], deterministic_travel_time=distance, variance=variance, lognormal=lognormal)
+            ijEdge.saving = saving
+            edges.append(ijEdge)
+
+        return tuple(edges)
@@ -0,0 +1,112 @@
+import time
+import json
+import functools
+import collections
+
+
+
+class Profiler (object):
+    """
+    An instance of this class records how the time of a run of an algorithm is
+    spent among its phases (e.g., the search of gamma, the constructions, the
+    simulations), how many times each phase is entered, and some counters (e.g.,
+    the feasible constructions or the replications made).
+
+    The phases are measured by wrapping the functions that make them (see wrap),
+    so that the algorithms can use the functions as they are when no profiler is
+    used, without any overhead. The time of a phase includes the time of the
+    phases nested in it (e.g., the constructions include the merges).
+
+    """
+
+    def __init__ (self):
+        """
+        Constructor.
+
+        :attr times: The wall time (in seconds) spent in each phase.
+        :attr calls: The number of times each phase has been entered.
+        :attr counters: The other counters.
+
+        """
+        self.times = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+
+
+    def wrap (self, phase, function):
+        """
+        This method returns a function doing the same as <function>, whose calls
+        are recorded as the phase <phase>.
+
+        """
+        times, calls, clock = self.times, self.calls, time.perf_counter
+
+        @functools.wraps(function)
+        def timed (*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[phase] += clock() - start
+                calls[phase] += 1
+
+        return timed
+
+
+    def add (self, phase, elapsed):
+        """
+        This method records a call of <elapsed> seconds of the phase <phase>.
+
+        """
+        self.times[phase] += elapsed
+        self.calls[phase] += 1
+
+
+    def count (self, counter, n = 1):
+        """
+        This method increases a counter by <n>.
+
+        """
+        self.counters[counter] += n
+
+
+    def merge (self, other):
+        """
+        This method adds the times, calls and counters of another Profiler
+        (e.g., of a worker process) to this one.
+
+        """
+        for phase, elapsed in other.times.items():
+            self.times[phase] += elapsed
+        self.calls.update(other.calls)
+        self.counters.update(other.counters)
+
+
+    def as_dict (self):
+        """
+        :return: The times, calls and counters as a dictionary of dictionaries.
+
+        """
+        return {
+            "times" : dict(self.times),
+            "calls" : dict(self.calls),
+            "counters" : dict(self.counters),
+        }
+
+
+    def to_json (self, file = None, **kwargs):
+        """
+        This method exports the times, calls and counters in JSON format.
+
+        :param file: The path or text file where they are written (if any).
+        :param kwargs: Other parameters of json.dump (e.g., indent).
+        :return: The JSON string.
+
+        """
+        text = json.dumps(self.as_dict(), **kwargs)
+        if isinstance(file, str):
+            with open(file, "w") as f:
+                f.write(text)
+        elif file is not None:
+            file.write(text)
+        return text
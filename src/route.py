@@ -1,3 +1,4 @@
+import math
 import itertools
 import numpy as np
 
@@ -26,6 +27,9 @@ class Route (object):
     An instance of this class represents a route made by a vehicle.
     It is represented as a set of edges.
 
+    The route keeps track of its direction: reversing it only flips a flag,
+    and the reversed list of edges is built only when it is required.
+
     """
     def __init__(self, edges):
         """
@@ -36,15 +40,74 @@ class Route (object):
         :param delay: The aggregated delay on the route.
         :param delayCost: The delay cost of the route.
 
+        :attr sampled: The number of replications simulated for the route, including
+                        those discarded since (but not those loaded from a cache).
+
         """
-        self.edges = edges
+        self._edges = edges
+        self._reversed = False
         self.travel_time = 0
         self._deterministic_cost = 0.0
         self._stochastic_cost = 0.0
         self.evaluated = False
         self.simulated = False
+        self._profiles = [None, None]
+        self.sampled = 0
+        self._reset_simulation(None)
         
         
+    @property
+    def edges (self):
+        """
+        The edges that constitute the route, in the current direction.
+
+        """
+        if self._reversed:
+            self._flip()
+        return self._edges
+
+
+    @edges.setter
+    def edges (self, edges):
+        self._edges = edges
+        self._reversed = False
+        self._profiles = [None, None]
+
+
+    def _flip (self):
+        """
+        This method stores the list of edges in the opposite direction,
+        changing the representation but not the route.
+
+        """
+        self._edges = list(reversed([edge.inverse for edge in self._edges]))
+        self._reversed = not self._reversed
+        self._profiles.reverse()
+
+
+    @property
+    def depot (self):
+        return self._edges[0].origin
+
+
+    @property
+    def first (self):
+        """
+        The first customer visited.
+
+        """
+        return self._edges[-1].origin if self._reversed else self._edges[0].end
+
+
+    @property
+    def last (self):
+        """
+        The last customer visited.
+
+        """
+        return self._edges[0].end if self._reversed else self._edges[-1].origin
+
+
     @property
     def deterministic_cost (self):
         if not self.evaluated:
@@ -69,16 +132,193 @@ class Route (object):
         return self.travel_time, self._deterministic_cost
     
     
-    def simulate (self, maxiter, max_travel_time):
+    @property
+    def standard_error (self):
+        """
+        The standard error of the stochastic cost.
+
+        """
+        if not self.simulated:
+            raise Exception("Route not simulated.")
+        if self._completed < 2:
+            return math.inf
+        return math.sqrt(self._m2 / (self._completed - 1) / self._completed)
+
+
+    @property
+    def reliability (self):
+        """
+        The fraction of replications completed within the maximum travel time.
+
+        """
+        if not self.simulated:
+            raise Exception("Route not simulated.")
+        return self._completed / self.replications if self.replications > 0 else 0.0
+
+
+    def _reset_simulation (self, max_travel_time):
+        """
+        This method discards the replications made so far.
+
+        :attr replications: The number of replications made.
+        :attr _completed: The number of replications completed within the maximum travel time.
+        :attr _mean: The mean delay cost of the completed replications.
+        :attr _m2: The sum of squared deviations from the mean of the delay costs.
+
+        """
+        self.replications = 0
+        self._completed = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max_travel_time = max_travel_time
+
+
+    def extend_simulation (self, maxiter, max_travel_time, vectorized=False, crn=None, rng=None):
+        """
+        This method makes <maxiter> additional replications, and updates the
+        stochastic cost with the results of all the replications made so far.
+        If no replication has been completed within the maximum travel time,
+        the stochastic cost is infinite.
+
+        :param maxiter: The number of additional replications.
+        :param max_travel_time: The maximum travel time of the route.
+        :param vectorized: If True the replications are simulated all together
+                            using array operations.
+        :param crn: The CommonRandomNumbers used for the replications (if any).
+        :param rng: The numpy Generator the travel times are drawn from (if None,
+                    a new one is created).
+
+        """
+        if not self.simulated or max_travel_time != self._max_travel_time:
+            self._reset_simulation(max_travel_time)
+
+        edges = tuple(self.edges)
+        normals = crn.normals(edges, self.replications, self.replications + maxiter) if crn is not None else None
+        costs = global_methods.sample(edges, maxiter, max_travel_time, vectorized, normals, rng)
+        self._completed, self._mean, self._m2 = global_methods.merge_statistics(self._completed, self._mean, self._m2, costs)
+
+        self.replications += maxiter
+        self.sampled += maxiter
+        self.simulated = True
+        self._stochastic_cost = self._mean if self._completed > 0 else math.inf
+        return self._stochastic_cost
+
+    
+    @property
+    def simulation_state (self):
+        """
+        The state of the simulation of the route, i.e., the number of replications
+        made and completed, the mean delay cost and the sum of squared deviations.
+
+        """
+        return self.replications, self._completed, self._mean, self._m2
+
+
+    def load_simulation (self, cache, max_travel_time):
+        """
+        This method restores the state of the simulation of the route from a cache.
+
+        :param cache: The SimulationCache.
+        :param max_travel_time: The maximum travel time of the route.
+        :return: True if the route was in cache, False otherwise.
+
+        """
+        state = cache.get((self.sequence, max_travel_time))
+        if state is None:
+            return False
+        self.replications, self._completed, self._mean, self._m2 = state
+        self._max_travel_time = max_travel_time
+        self.simulated = True
+        self._stochastic_cost = self._mean if self._completed > 0 else math.inf
+        return True
+
+
+    def save_simulation (self, cache):
+        """
+        This method stores the state of the simulation of the route in a cache.
+
+        :param cache: The SimulationCache.
+
+        """
+        cache.put((self.sequence, self._max_travel_time), self.simulation_state)
+
+    
+    def simulate (self, maxiter, max_travel_time, vectorized=False, target_error=None, batch_size=50, cache=None, crn=None, rng=None):
         """
         Stochastic simulation of the route.
+
+        In sequential mode (i.e., when a <target_error> is given) the replications
+        are made in batches, until the standard error of the stochastic cost is
+        lower than <target_error> or <maxiter> replications have been made.
+
+        If a cache is given, the replications already made for the same sequence
+        of customers are reused, and only the missing ones are made.
+
+        If common random numbers are given, the i-th replication of the route uses
+        the i-th variates of its edges (see CommonRandomNumbers). NOTE: The cache
+        must be used with the same common random numbers.
+
+        :param maxiter: The number of replications (the maximum in sequential mode).
+        :param max_travel_time: The maximum travel time of the route.
+        :param vectorized: If True the replications are simulated all together
+                            using array operations.
+        :param target_error: The standard error required in sequential mode.
+        :param batch_size: The replications of each batch in sequential mode.
+        :param cache: The SimulationCache.
+        :param crn: The CommonRandomNumbers.
+        :param rng: The numpy Generator the travel times are drawn from (if None,
+                    a new one is created).
         
         """
-        self.simulated = True
-        self._stochastic_cost = global_methods.simulate(tuple(self.edges), maxiter, max_travel_time)
+        rng = rng if rng is not None else np.random.default_rng()
+        self.simulated = False
+        self._reset_simulation(max_travel_time)
+        if cache is not None:
+            self.load_simulation(cache, max_travel_time)
+
+        if target_error is None:
+            if self.replications < maxiter:
+                self.extend_simulation(maxiter - self.replications, max_travel_time, vectorized, crn, rng)
+        else:
+            while self.replications < maxiter and (self.replications == 0 or self.standard_error > target_error):
+                self.extend_simulation(min(batch_size, maxiter - self.replications), max_travel_time, vectorized, crn, rng)
+
+        if cache is not None:
+            self.save_simulation(cache)
         return self._stochastic_cost
     
 
+    def profile (self, reverse=False):
+        """
+        This method returns the delay profile of the customers of the route
+        (see global_methods.profile), either in the current or in the opposite
+        direction. Profiles are cached until the route is modified.
+
+        :param reverse: If True the profile of the reversed route is returned.
+
+        """
+        # The profiles are cached according to the direction the edges are stored in.
+        reverse = reverse != self._reversed
+        i = 1 if reverse else 0
+        if self._profiles[i] is None:
+            if reverse:
+                steps = ((e.deterministic_travel_time, e.origin) for e in reversed(self._edges[1:]))
+            else:
+                steps = ((e.deterministic_travel_time, e.end) for e in self._edges[:-1])
+            self._profiles[i] = global_methods.profile(steps)
+        return self._profiles[i]
+
+
+    @property
+    def sequence (self):
+        """
+        The IDs of the customers in the order they are visited.
+
+        """
+        sequence = tuple(e.end.ID for e in self._edges[:-1])
+        return sequence[::-1] if self._reversed else sequence
+
+
     def __len__ (self):
         """
         Overwrite the __len__ operator to provide a faster information concerning
@@ -87,7 +327,7 @@ class Route (object):
         :return: The number of edges that make the route.
 
         """
-        return len(self.edges)
+        return len(self._edges)
 
 
     def __repr__ (self):
@@ -109,29 +349,41 @@ class Route (object):
 
         """
         # Check that the preparation to the merging has been made.
-        if by.origin != self.edges[-1].origin or by.end != route.edges[0].end:
+        if by.origin != self.last or by.end != route.first:
             raise MergeError (f"The routes {self} and {route} have not been correctly prepared for merging with edge {by}.")
 
+        # Store the two routes in the same direction, flipping the shortest one if needed.
+        if self._reversed != route._reversed:
+            if len(self._edges) <= len(route._edges):
+                self._flip()
+            else:
+                route._flip()
+
         # Adjust the edges concerning the first route.
-        self.travel_time -= self.edges[-1].deterministic_travel_time
-        self.edges.pop(-1)
+        self.travel_time -= (self._edges[0] if self._reversed else self._edges[-1]).deterministic_travel_time
         iNode = by.origin
-        if len(self.edges) > 1:
+        if len(self._edges) > 2:
             iNode.interior = True
 
         # Adjust the edges concerning the second route
-        route.edges.pop(0)
         jNode = by.end
-        if len(route.edges) > 1:
+        if len(route._edges) > 2:
             jNode.interior = True
 
         # Update list of edges and demand (for the moment the cost too)
-        self.travel_time, self._deterministic_cost = global_methods.evaluate(itertools.chain([by], route.edges), self.travel_time, self._deterministic_cost)
-        self.edges.extend(list(itertools.chain([by], route.edges)))
+        if self._reversed:
+            redges = (edge.inverse for edge in reversed(route._edges[:-1]))
+            self._edges = route._edges[:-1] + [by.inverse] + self._edges[1:]
+        else:
+            redges = route._edges[1:]
+            self._edges.pop(-1)
+            self._edges.extend(itertools.chain([by], route._edges[1:]))
+        self.travel_time, self._deterministic_cost = global_methods.evaluate(itertools.chain([by], redges), self.travel_time, self._deterministic_cost)
+
+        self._profiles = [None, None]
 
         # Change the reference to the route in the nodes
-        by.end.route = self
-        for edge in route.edges[:-1]:
+        for edge in route._edges[:-1]:
             edge.end.route = self
 
 
@@ -141,7 +393,11 @@ class Route (object):
         This method reverses in place the current Route,
         e.g., [(0,2), (2,6), (6,4), (4,0)]  becomes  [(0,4), (4,6), (6,2), (2,0)].
 
+        The edges are not reversed, only the direction is changed, and the cost
+        of the reversed route is obtained from its delay profile.
+
         """
-        self.edges = list(reversed([edge.inverse for edge in self.edges]))
+        self._reversed = not self._reversed
         if self.__len__() > 2:
-            self.travel_time, self._deterministic_cost = global_methods.evaluate(self.edges)
+            depot = self.depot
+            self._deterministic_cost = self.profile().cost + global_methods.predict(max(self.travel_time - depot.close, 0), depot.importance)
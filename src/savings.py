@@ -0,0 +1,136 @@
+class SavingsList (object):
+    """
+    An instance of this class represents the savings list used during the
+    construction of a solution.
+
+    The edges (sorted by saving) are split in blocks of BLOCK_SIZE edges,
+    and the number of edges still in each block is tracked by a Fenwick
+    (binary indexed) tree. Selecting and removing the k-th remaining edge
+    costs a descent of the tree, logarithmic in the number of blocks, plus
+    a pop from a single block, instead of the O(n) of list.pop on the whole
+    savings list.
+
+    NOTE: Blocks are used instead of single edges because, in pure Python,
+    a tree with one leaf per edge is slower than the memmove of list.pop
+    for the usual size of the problems.
+
+    The blocks keep the positions of the edges in the sorted list, so that
+    it is known which edges are still in list (see get).
+
+    Resetting the list does not copy the edges: a block is copied from the
+    full one only when an edge is first popped from it, and the popped edges
+    are marked with the number of the current construction, so that the marks
+    of the previous constructions do not need to be cleared.
+
+    """
+
+    BLOCK_SIZE = 1024
+
+    def __init__ (self, edges):
+        """
+        Constructor.
+
+        :param edges: The edges sorted by saving.
+
+        """
+        self.edges = edges
+        self._size = len(edges)
+
+        B = self.BLOCK_SIZE
+        self._full_blocks = [list(range(i, min(i + B, len(edges)))) for i in range(0, len(edges), B)]
+
+        # Fenwick tree of the number of edges in each block, padded to a power of 2
+        # so that the descent does not need bounds checks (index 0 is not used).
+        n_blocks = len(self._full_blocks)
+        self._tree_size = 1 << (n_blocks - 1).bit_length() if n_blocks > 1 else 1
+        tree = [0] * (self._tree_size + 1)
+        for i, block in enumerate(self._full_blocks, start=1):
+            tree[i] = len(block)
+        for i in range(1, self._tree_size + 1):
+            parent = i + (i & -i)
+            if parent <= self._tree_size:
+                tree[parent] += tree[i]
+        self._full_tree = tree
+
+        # The position of the edge connecting each pair of nodes
+        self._between = {}
+        for i, edge in enumerate(edges):
+            a, b = edge.origin.ID, edge.end.ID
+            self._between[(a, b) if a < b else (b, a)] = i
+
+        # The construction each edge has been last popped in
+        self._popped = [0] * self._size
+        self._construction = 0
+
+        self.reset()
+
+
+    def reset (self):
+        """
+        This method puts back in list all the edges.
+
+        """
+        self._blocks = [None] * len(self._full_blocks)
+        self._tree = self._full_tree[:]
+        self._remaining = self._size
+        self._construction += 1
+
+
+    def __len__ (self):
+        """
+        :return: The number of edges still in list.
+
+        """
+        return self._remaining
+
+
+    def pop (self, index):
+        """
+        This method removes and returns the edge in position <index> among the
+        edges still in list, as list.pop would do.
+
+        :param index: The position of the edge among the remaining ones.
+        :return: The edge.
+
+        """
+        tree, size = self._tree, self._tree_size
+
+        # Find the block descending the tree
+        pos, rank, step = 0, index + 1, size
+        while step:
+            nxt = pos + step
+            count = tree[nxt]
+            if count < rank:
+                pos = nxt
+                rank -= count
+            step >>= 1
+
+        # Update the counts
+        i = pos + 1
+        while i <= size:
+            tree[i] -= 1
+            i += i & -i
+        self._remaining -= 1
+
+        block = self._blocks[pos]
+        if block is None:
+            block = self._blocks[pos] = self._full_blocks[pos][:]
+        i = block.pop(rank - 1)
+        self._popped[i] = self._construction
+        return self.edges[i]
+
+
+    def get (self, node1, node2):
+        """
+        This method returns the edge connecting two nodes, if it is still in list.
+
+        :param node1: The first node.
+        :param node2: The second node.
+        :return: The edge (in the direction it has in list), or None.
+
+        """
+        a, b = node1.ID, node2.ID
+        i = self._between.get((a, b) if a < b else (b, a))
+        if i is None or self._popped[i] == self._construction:
+            return None
+        return self.edges[i]
@@ -0,0 +1,86 @@
+import math
+import statistics
+import numpy as np
+
+
+
+class QuantileSketch (object):
+    """
+    An instance of this class summarises a stream of non-negative values
+    (e.g., the delay costs of the replications of a simulation) in a fixed
+    amount of memory, and estimates their quantiles.
+
+    The positive values are counted in buckets whose bounds grow geometrically
+    (i.e., bucket i holds the values in (g^(i-1), g^i]), so that any quantile
+    is estimated with a relative error lower than <relative_accuracy>, whatever
+    the number of values. The zeros (e.g., replications without delays) are
+    counted apart.
+
+    """
+
+    def __init__ (self, relative_accuracy = 0.01):
+        """
+        Constructor.
+
+        :param relative_accuracy: The maximum relative error of the quantiles.
+
+        :attr count: The number of values summarised.
+
+        """
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._offset = 0
+        self._zeros = 0
+        self.count = 0
+
+
+    def __len__ (self):
+        return self.count
+
+
+    def update (self, values):
+        """
+        This method adds an array of values to the sketch.
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self._zeros += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive) == 0:
+            return
+
+        index = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        low, high = int(index.min()), int(index.max())
+
+        # Extend the buckets to the range of the new values
+        if len(self._counts) == 0:
+            self._offset = low
+        start = min(low, self._offset)
+        stop = max(high + 1, self._offset + len(self._counts))
+        if start != self._offset or stop != self._offset + len(self._counts):
+            counts = np.zeros(stop - start, dtype=np.int64)
+            counts[self._offset - start:self._offset - start + len(self._counts)] = self._counts
+            self._counts, self._offset = counts, start
+
+        self._counts += np.bincount(index - self._offset, minlength=len(self._counts))
+
+
+    def quantile (self, q):
+        """
+        This method returns the estimate of the <q>-quantile of the values.
+
+        :param q: The quantile, between 0 and 1.
+
+        """
+        if self.count == 0:
+            raise statistics.StatisticsError("quantile requires at least one data point")
+
+        rank = q * (self.count - 1)
+        if rank < self._zeros:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self._counts), rank - self._zeros, side="right"))
+        i = min(i, len(self._counts) - 1)
+        return 2 * self._gamma**(i + self._offset) / (self._gamma + 1)
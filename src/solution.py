@@ -1,3 +1,12 @@
+import math
+import numpy as np
+
+
+# The z-score used for the confidence interval of the stochastic cost (95%)
+Z_SCORE = 1.96
+
+
+
 
 class Solution (object):
 
@@ -58,6 +67,11 @@ class Solution (object):
 
     @property
     def reliability (self):
+        """
+        The probability that all the routes are completed within the maximum
+        travel time, estimated from the replications of the simulation.
+
+        """
         if self.simulated:
             return self._reliability
         raise Exception("Solution not simulated.")
@@ -75,7 +89,69 @@ class Solution (object):
         return self._deterministic_cost
 
 
-    def simulate (self, maxiter, max_travel_time):
+    @property
+    def standard_error (self):
+        if self.simulated:
+            return math.sqrt(sum(r.standard_error**2 for r in self.routes))
+        raise Exception("Solution not simulated.")
+
+
+
+    def simulate (self, maxiter, max_travel_time, vectorized=False, target_error=None, batch_size=50, bound=None, cache=None, crn=None, rng=None):
+        """
+        Stochastic simulation of the solution.
+
+        In sequential mode (i.e., when a <target_error> or a <bound> is given) all the
+        routes are simulated in batches of replications, until the standard error of the
+        stochastic cost is lower than <target_error>, or <maxiter> replications have been
+        made. If a <bound> is given, the simulation also stops as soon as the solution is
+        clearly worse than it, i.e., the lower end of the confidence interval of the
+        stochastic cost is higher than <bound>.
+
+        If a cache is given, the routes reuse the replications already made for the
+        same sequences of customers (see Route.simulate), and if common random numbers are
+        given, all the solutions simulated with them share the travel times of their edges.
+
+        :param maxiter: The number of replications (the maximum in sequential mode).
+        :param max_travel_time: The maximum travel time of the routes.
+        :param vectorized: If True the replications are simulated all together
+                            using array operations.
+        :param target_error: The standard error required in sequential mode.
+        :param batch_size: The replications of each batch in sequential mode.
+        :param bound: The stochastic cost (e.g., of the best solution) beyond which the simulation stops.
+        :param cache: The SimulationCache.
+        :param crn: The CommonRandomNumbers.
+        :param rng: The numpy Generator the travel times are drawn from (if None,
+                    a new one is created).
+
+        """
+        rng = rng if rng is not None else np.random.default_rng()
         self.simulated = True
-        self._stochastic_cost = sum(route.simulate(maxiter, max_travel_time) for route in self.routes)
+        if target_error is None and bound is None:
+            self._stochastic_cost = sum(route.simulate(maxiter, max_travel_time, vectorized, cache=cache, crn=crn, rng=rng) for route in self.routes)
+            self._reliability = math.prod(r.reliability for r in self.routes)
+            return self._stochastic_cost
+
+        for route in self.routes:
+            route.simulate(min(batch_size, maxiter), max_travel_time, vectorized, cache=cache, crn=crn, rng=rng)
+
+        while True:
+            self._stochastic_cost = sum(r.stochastic_cost for r in self.routes)
+            error = self.standard_error
+            if target_error is not None and error <= target_error:
+                break
+            if bound is not None and self._stochastic_cost - Z_SCORE * error > bound:
+                break
+
+            routes = [r for r in self.routes if r.replications < maxiter]
+            if not routes:
+                break
+            for route in routes:
+                route.extend_simulation(min(batch_size, maxiter - route.replications), max_travel_time, vectorized, crn, rng)
+
+        if cache is not None:
+            for route in self.routes:
+                route.save_simulation(cache)
+
+        self._reliability = math.prod(r.reliability for r in self.routes)
         return self._stochastic_cost
@@ -1,10 +1,9 @@
 import node
-import edge
+import problem
 
 import random
 import numpy as np
 import itertools
-import math
 
 
 # Names of the file where the benchmark problems are written
@@ -53,6 +52,9 @@ def readfile (filename : str, path : str = "../data/" ):
     We use tuple instead of List for reason of performance. Tuple are immutable
     and passed by value, this makes them high-performant.
 
+    Files without time windows (i.e., only coordinates and demand) are accepted,
+    and the nodes are given an opening time of 0 and no closing time.
+
 
     :param filename: The name of the file to read.
     :param path: The directory where the file is.
@@ -71,8 +73,8 @@ def readfile (filename : str, path : str = "../data/" ):
             nodes.append(node.Node (i,
                                     x = int(float(tokens[0])),
                                     y = int(float(tokens[1])),
-                                    open = float(tokens[3]),
-                                    close = float(tokens[4]),
+                                    open = float(tokens[3]) if len(tokens) > 3 else 0.0,
+                                    close = float(tokens[4]) if len(tokens) > 4 else float("inf"),
                                     demand = int(tokens[2]),
                                     importance = int(tokens[2]) / total_demand
                                  ))
@@ -88,47 +90,13 @@ def build_edges (nodes, pvariance = 0.25):
     Given the set of nodes that constitute the problem, this method construct the
     edges connecting the nodes to each other and each node to the depot.
 
+    Distances, variances and savings are computed at once by a ProblemInstance.
+
     :param nodes: The nodes of the problem.
     :return: The edges connecting the nodes sorted by savings
 
     """
-    # Node 0 is the depot
-    depot = nodes[0]
-
-    for node in nodes[1:]:
-        # Calculate the distance from the depot calling the __sub__ operator
-        distance_from_depot = node - depot
-        variance = math.pow(pvariance * distance_from_depot, 2)
-        # Make the edges connecting the node to the depot
-        dn_edge = edge.Edge(depot, node, deterministic_travel_time = distance_from_depot, variance=variance)
-        nd_edge = edge.Edge(node, depot, deterministic_travel_time = distance_from_depot, variance=variance)
-        # Set the inverse edges
-        dn_edge.inverse = nd_edge
-        nd_edge.inverse = dn_edge
-        # save in node a reference to the (depot, node) edge (arc)
-        node.dn_edge = dn_edge
-        node.nd_edge = nd_edge
-        
-    edges = list()
-    for inode, jnode in itertools.combinations(nodes[1:], 2):
-        # Compute euclidean distance between nodes
-        distance = inode - jnode
-        variance = math.pow(pvariance * distance, 2)
-        # Instantiate edges
-        ijEdge = edge.Edge(inode, jnode, deterministic_travel_time=distance, variance=variance)
-        jiEdge = edge.Edge(jnode, inode, deterministic_travel_time=distance, variance=variance)
-        # make the inverse
-        ijEdge.inverse = jiEdge
-        jiEdge.inverse = ijEdge
-        # Compute the savings according to Clark-Wright Saving algorithm
-        saving = inode.nd_edge.deterministic_travel_time + jnode.dn_edge.deterministic_travel_time - distance
-        ijEdge.saving = saving
-        jiEdge.saving = saving
-
-        # Just one edge is included in the savings list
-        edges.append (ijEdge)
-
-    return tuple(sorted(edges, key=lambda i: i.saving, reverse=True))
+    return problem.ProblemInstance.from_nodes(nodes, pvariance).build_edges(nodes)
 
 
 
@@ -161,7 +129,7 @@ def build_time_windows (*, filename, path = "../data/", n_vehicles = 5, time_win
                                     importance = int(tokens[2]) / total_demand
                                  ))
     #nodes = tuple(nodes)
-    dists = np.array([[n - m  for m in nodes] for n in nodes])
+    dists = problem.ProblemInstance.from_nodes(nodes).distance
 
 
     # Shuffle nodes and split them in a number of clusters equal to